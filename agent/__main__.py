@@ -1,10 +1,13 @@
 # main.py
 
+import os
 from pathlib import Path
 
 import dotenv
 
 from .agent import ResearchAgent
+from .tracing import ChromeTraceExporter, set_tracer
+from .visualization import LiveGraphExporter
 
 
 def main():
@@ -15,7 +18,18 @@ def main():
     output_dir = Path("output")
     output_dir.mkdir(exist_ok=True)
 
-    agent = ResearchAgent()
+    # RESEARCH_TRACE=<file> records a Chrome trace-event JSON of the run
+    trace_file = os.getenv("RESEARCH_TRACE")
+    tracer = ChromeTraceExporter() if trace_file else None
+    set_tracer(tracer)
+
+    # Mermaid/DOT graphs of the path that are updated after every step
+    live_graph = LiveGraphExporter(
+        output_dir / "research_path.live.mmd", output_dir / "research_path.live.dot"
+    )
+    print(f"Live research graph: {live_graph.mermaid_path}, {live_graph.dot_path}")
+
+    agent = ResearchAgent(live_graph=live_graph)
     final_report = agent.start("Is Solana a good investment?")
 
     # Save final report
@@ -41,6 +55,9 @@ def main():
     # Print Mermaid diagram to console
     agent.print_research_path()
 
+    if tracer is not None:
+        print(f"Trace saved to: {tracer.write(trace_file)}")
+
 
 if __name__ == "__main__":
     main()
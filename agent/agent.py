@@ -1,13 +1,78 @@
 # agent.py
 
+import asyncio
+import copy
+import functools
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import AsyncIterator, Callable, Iterator, Union
+
 from azure.ai.inference.models import SystemMessage, UserMessage
 
-from agent.deepseek_client import DeepseekClient
+from agent.blobstore import BlobRef, BlobStore
+from agent.budget import (
+    STOP_LOOP,
+    STOP_MAX_TOOL_CALLS,
+    STOP_NO_QUERY,
+    STOP_REPORT,
+    BudgetTracker,
+    ResearchBudget,
+)
+from agent.deepseek_client import (
+    REQUEST_TIMEOUT,
+    STALL_TIMEOUT,
+    THINK_BUDGET_NUDGE,
+    DeepseekClient,
+)
+from agent.events import (
+    BodyToken,
+    QueryIssued,
+    ReportChunk,
+    ResearchEvent,
+    StepMetrics,
+    Stopped,
+    ThinkToken,
+    ToolResult,
+)
+from agent.knowledge import KnowledgeStore, format_prior_findings
+from agent.local_search import local_search_engine, shared_local_engine
+from agent.loops import ACTION_FORCE_REPORT, LoopDetector
 from agent.neo4j_client import Neo4jClient
-from agent.prompts import NEO4J_SYSTEM_PROMPT, SYSTEM_PROMPT
+from agent.passages import PassageFingerprints, dedup_passages, pack_passages
+from agent.prompts import (
+    FORCE_REPORT_PROMPT,
+    LOOP_CORRECTION_PROMPT,
+    NEO4J_SYSTEM_PROMPT,
+    PLANNING_PROMPT,
+    PRIOR_FINDINGS_PROMPT,
+    SUBTOPIC_QUESTION_TEMPLATE,
+    SUMMARIZE_RESULTS_PROMPT,
+    SYNTHESIS_PROMPT,
+    SYSTEM_PROMPT,
+)
+from agent.results import ResultSet, as_result_set
+from agent.routing import (
+    STAGE_PLAN,
+    STAGE_QUERY,
+    STAGE_REPORT,
+    STAGE_SEARCH_MOCK,
+    STAGE_SUMMARIZE,
+    ModelRouting,
+)
+from agent.scheduler import LANE_LLM, LANE_TOOL, ResearchScheduler
 from agent.search import mock_search_engine
-from agent.utils import extract_cypher_content, extract_query_content
-from agent.visualization import ResearchPathVisualizer
+from agent.synthetic_search import synthetic_search_engine
+from agent.think_store import ThinkStore
+from agent.tracing import span
+from agent.utils import (
+    extract_cypher_content,
+    extract_query_content,
+    extract_subtopics,
+)
+from agent.visualization import LiveGraphExporter, ResearchPathVisualizer
 
 
 class ResearchAgent:
@@ -17,32 +82,168 @@ class ResearchAgent:
         neo4j_uri: str = None,
         neo4j_username: str = None,
         neo4j_password: str = None,
+        corpus_dir: str = None,
+        search_engine: Callable[[str], str] = None,
+        result_token_budget: int = None,
+        verbose: bool = True,
+        budget: ResearchBudget = None,
+        scheduler: ResearchScheduler = None,
+        priority: int = 0,
+        blob_store: BlobStore = None,
+        think_store: ThinkStore = None,
+        routing: ModelRouting = None,
+        summarize_results: bool = False,
+        knowledge_store: KnowledgeStore = None,
+        think_budget: int = None,
+        think_budget_action: str = THINK_BUDGET_NUDGE,
+        dedup_results: bool = False,
+        loop_detection: bool = False,
+        stall_timeout: float = STALL_TIMEOUT,
+        request_timeout: float = REQUEST_TIMEOUT,
+        live_graph: LiveGraphExporter = None,
     ):
         """
         Initialize the research agent.
 
         Args:
-            tool: Either "search" or "neo4j" to specify which tool to use
+            tool: One of "search" (LLM-mocked search), "local" (BM25 over a local
+                corpus), "synthetic" (deterministic zero-LLM results for load
+                testing) or "neo4j" to specify which tool to use
             neo4j_uri: Neo4j database URI (required if tool="neo4j")
             neo4j_username: Neo4j username (required if tool="neo4j")
             neo4j_password: Neo4j password (required if tool="neo4j")
+            corpus_dir: Directory of .md/.txt/.jsonl documents for tool="local".
+                Defaults to the LOCAL_SEARCH_CORPUS environment variable.
+            search_engine: Optional callable (query -> ResultSet or text) that
+                replaces the default engine of a search-style tool, e.g. a
+                configured SyntheticSearchEngine
+            result_token_budget: If set, tool results are split into passages and
+                only the most relevant ones that fit this many tokens are added to
+                the conversation. The full results are still kept in research_path.
+            verbose: Color-print the streamed model output (including chain-of-thought)
+            budget: Optional limits on steps, wall-clock time, output tokens and
+                tool calls for each run (a start_tree run counts as one). Defaults
+                to no limits.
+            scheduler: Optional ResearchScheduler shared by concurrent agents; model
+                calls and tool calls then wait for a slot in its lanes
+            priority: Scheduling priority of this agent's runs (higher goes first).
+                The budget deadline, if any, is used as the scheduling deadline.
+            blob_store: Store holding tool results for both the message history and
+                research_path. Defaults to a private store that spills results of
+                64k+ characters to compressed temporary files.
+            think_store: Optional ThinkStore that captures each step's
+                chain-of-thought (compressed, written by a background thread).
+                research_path entries then reference it under "think"; it never
+                enters the prompt.
+            routing: Model, temperature and max_tokens per stage (query writing,
+                planning, search mocking, summarization, report). Defaults to
+                ModelRouting.from_env(), i.e. R1 everywhere unless
+                RESEARCH_MODEL_ROUTING is set.
+            summarize_results: Condense each tool result into key facts with
+                sources (using the "summarize" route) while the next step is
+                already being planned. The step right after a tool call still
+                sees the result as is; later turns get the summary instead. The
+                raw result stays in research_path, the summary is added under
+                "summary".
+            knowledge_store: Optional KnowledgeStore shared across runs. Prior
+                findings relevant to the question are added to the first turn
+                (fresh ones to be reused, stale ones to be re-verified) and
+                every final report is stored in it.
+            think_budget: Optional limit on the (estimated) tokens of one step's
+                <think> section. A step that exceeds it is aborted and asked
+                again with a nudge to answer right away; the number of aborts is
+                recorded as "think_budget_hits" on the step.
+            think_budget_action: "nudge" drops the aborted reasoning, "continue"
+                sends it back to the model to answer from
+            dedup_results: Replace passages of a tool result that the model was
+                already shown in an earlier step of the run (exact or near
+                duplicates) by back-references like "(same as step 3 result 2)".
+                The number replaced is recorded as "duplicates" on the step.
+                Cannot be combined with summarize_results.
+            loop_detection: Watch for repeated or cycling queries and for
+                searches that stop returning new passages. The first detection
+                skips the repeated search (or annotates the stalled result) and
+                asks for a different query; the next one forces the report. Each
+                detection is recorded as "loop_event" on its step. Off by default.
+            stall_timeout: Seconds a model response may go without a new token
+            request_timeout: Seconds one streamed model request may take. A
+                response that stalls, times out or loses its connection is
+                resumed from its partial output; resumes are recorded as
+                "stream_resumes" on the step. None disables a timeout.
+            live_graph: Optional LiveGraphExporter that receives every step as
+                it is recorded, so Mermaid/DOT files of the path can be watched
+                during the run (tree runs included)
         """
-        if tool not in ["search", "neo4j"]:
-            raise ValueError('tool must be either "search" or "neo4j"')
+        if tool not in ["search", "local", "synthetic", "neo4j"]:
+            raise ValueError(
+                'tool must be one of "search", "local", "synthetic" or "neo4j"'
+            )
+        if dedup_results and summarize_results:
+            # Back-references point at raw results, which summaries replace
+            raise ValueError("dedup_results cannot be combined with summarize_results")
 
         self.tool = tool
-        self.client = DeepseekClient()
+        self.result_token_budget = result_token_budget
+        self.verbose = verbose
+        self.budget = budget or ResearchBudget()
+        self._shared_tracker = None
+        self.stop_reason = None
+        self.scheduler = scheduler
+        self.priority = priority
+        self._job = None
+        self.routing = routing or ModelRouting.from_env()
+        self.stall_timeout = stall_timeout
+        self.request_timeout = request_timeout
+        self.client = self._new_client()
 
         # Initialize appropriate system prompt and tool client
         if tool == "search":
             self.system_prompt = SYSTEM_PROMPT
             self.tool_client = None
+            self.search_engine = functools.partial(
+                mock_search_engine, route=self.routing.route(STAGE_SEARCH_MOCK)
+            )
+        elif tool == "local":
+            self.system_prompt = SYSTEM_PROMPT
+            self.tool_client = None
+            if corpus_dir:
+                self.search_engine = shared_local_engine(corpus_dir)
+            else:
+                self.search_engine = local_search_engine
+        elif tool == "synthetic":
+            self.system_prompt = SYSTEM_PROMPT
+            self.tool_client = None
+            self.search_engine = synthetic_search_engine
         else:  # neo4j
             if not all([neo4j_uri, neo4j_username, neo4j_password]):
                 raise ValueError("Neo4j connection details required when tool='neo4j'")
             self.system_prompt = NEO4J_SYSTEM_PROMPT
             self.tool_client = Neo4jClient(neo4j_uri, neo4j_username, neo4j_password)
+        self._owns_tool_client = True
+        self.live_graph = live_graph
+        self._graph_chain = ""
 
+        if search_engine is not None and tool != "neo4j":
+            self.search_engine = search_engine
+
+        # Tool results are stored once in the blob store; both the message
+        # history and research_path hold BlobRefs to them
+        self.blob_store = blob_store or BlobStore()
+        self.think_store = think_store
+        self._run_id = None
+        self._last_think = None
+        self.summarize_results = summarize_results
+        self._summary_client = None
+        self._summary_executor = None
+        # (message index, research_path entry, future) of running summaries
+        self._pending_summaries = []
+        self.knowledge_store = knowledge_store
+        self.think_budget = think_budget
+        self.think_budget_action = think_budget_action
+        # The element the model writes its next query in (for think budget nudges)
+        self.query_tag = "cypher" if tool == "neo4j" else "query"
+        self.dedup_results = dedup_results
+        self.loop_detection = loop_detection
         self.messages = [SystemMessage(content=self.system_prompt)]
         # Keep track of each step for "path" visualization
         # Each entry = {"query": ..., "assistant_response": ..., "results": ...}
@@ -56,79 +257,575 @@ class ResearchAgent:
         but we do color-print any <think> segments for debugging if verbose=True.
         """
         self.messages.append(UserMessage(content=query))
-        assistant_response = self.client.complete(
-            messages=self.messages,
-            model="Analysis-POC-DeepSeek-R1",
-            verbose=True,  # color-print chain-of-thought
-            ignore_think=True,  # do not include chain-of-thought in the final text
-        )
+        with self._slot(LANE_LLM):
+            assistant_response = self.client.complete(
+                messages=self._request_messages(),
+                verbose=self.verbose,  # color-print chain-of-thought
+                ignore_think=True,  # do not include chain-of-thought in the final text
+                think_budget=self.think_budget,
+                think_budget_action=self.think_budget_action,
+                query_tag=self.query_tag,
+                **self.routing.route(STAGE_QUERY).kwargs(),
+            )
         return assistant_response
 
+    def _request_messages(self) -> list:
+        """The message history with blob references loaded into UserMessages."""
+        return [
+            UserMessage(content=str(message))
+            if isinstance(message, BlobRef)
+            else message
+            for message in self.messages
+        ]
+
+    def _begin_job(self, name: str):
+        """Register a new run with the scheduler (if any)."""
+        if self.scheduler is None:
+            return
+        deadline = None
+        if self.budget.deadline_seconds is not None:
+            deadline = time.monotonic() + self.budget.deadline_seconds
+        self._job = self.scheduler.job(
+            name=name, priority=self.priority, deadline=deadline
+        )
+
+    def _slot(self, lane: str):
+        """Context manager holding a scheduler slot, or nothing without a scheduler."""
+        if self.scheduler is None or self._job is None:
+            return nullcontext()
+        return self.scheduler.slot(lane, self._job)
+
+    def prepare_results(
+        self, results: ResultSet, query: str, question: str
+    ) -> Union[str, ResultSet]:
+        """
+        Post-process raw tool output before it enters the conversation.
+        With a result_token_budget, only the top-scoring passages are kept.
+        """
+        if self.result_token_budget is None:
+            return results
+        with span("tool.pack_passages"):
+            return pack_passages(
+                results, query, question, token_budget=self.result_token_budget
+            )
+
+    def _new_client(self) -> DeepseekClient:
+        return DeepseekClient(
+            stall_timeout=self.stall_timeout, request_timeout=self.request_timeout
+        )
+
+    def summarize_result(self, results: str, query: str, question: str) -> str:
+        """Condense one tool result into a bullet list of key facts with sources."""
+        if self._summary_client is None:
+            self._summary_client = self._new_client()
+        with self._slot(LANE_LLM):
+            return self._summary_client.complete(
+                messages=[
+                    SystemMessage(content=SUMMARIZE_RESULTS_PROMPT),
+                    UserMessage(
+                        content=f"Research question: {question}\nQuery: {query}\n\n"
+                        f"Results:\n{results}"
+                    ),
+                ],
+                verbose=False,
+                ignore_think=True,
+                **self.routing.route(STAGE_SUMMARIZE).kwargs(),
+            )
+
+    def _submit_summary(self, entry: dict, query: str, question: str):
+        """Start summarizing the tool result just appended to the messages."""
+        if self._summary_executor is None:
+            # One worker: summaries of a run are short and must not overlap on
+            # the shared summary client
+            self._summary_executor = ThreadPoolExecutor(max_workers=1)
+        future = self._summary_executor.submit(
+            self.summarize_result, str(entry["results"]), query, question
+        )
+        self._pending_summaries.append((len(self.messages) - 1, entry, future))
+
+    def _swap_in_summaries(self):
+        """
+        Replace summarized tool results in the message history. The newest
+        result is only swapped if its summary is already done (it overlaps the
+        planning call that reads it); older ones are waited for. A failed or
+        empty summary leaves the raw result in place.
+        """
+        still_pending = []
+        for idx, (index, entry, future) in enumerate(self._pending_summaries):
+            if idx == len(self._pending_summaries) - 1 and not future.done():
+                still_pending.append((index, entry, future))
+                continue
+            try:
+                summary = future.result().strip()
+            except Exception:
+                continue
+            if summary:
+                ref = self.blob_store.put(summary)
+                self.messages[index] = ref
+                entry["summary"] = ref
+        self._pending_summaries = still_pending
+
+    def _end_summaries(self):
+        if self._summary_executor is not None:
+            self._summary_executor.shutdown(wait=False, cancel_futures=True)
+            self._summary_executor = None
+        self._pending_summaries = []
+
+    def prior_findings(self, question: str) -> list:
+        """Findings of earlier runs relevant to question (none without a store)."""
+        if self.knowledge_store is None:
+            return []
+        return self.knowledge_store.search(question)
+
+    def _remember_report(self, question: str, report: str):
+        if self.knowledge_store is not None:
+            self.knowledge_store.add_report(question, report)
+
+    def _add_step(self, step: dict):
+        """Append a step to research_path and draw it on the live graph, if any."""
+        self.research_path.append(step)
+        if self.live_graph is not None:
+            self.live_graph.add_step(step, self._graph_chain)
+
+    def _record_stop(self, step: dict, reason: str, tracker: BudgetTracker):
+        """Append the final step of a run, annotated with why the run stopped."""
+        step["stop_reason"] = reason
+        step["budget_usage"] = tracker.usage()
+        if self._job is not None:
+            step["scheduler_wait_seconds"] = round(self._job.wait_seconds, 4)
+        self._add_step(step)
+        self.stop_reason = reason
+
     def start(self, initial_question: str) -> str:
         """
         Continues reading the assistant's responses. If we see a final <report>, we stop.
         Otherwise, we extract a query from the assistant's response and pass it to
         either the search engine or Neo4j database. Then we feed those results back
         into the conversation.
+
+        When a budget is configured and about to run out, the next turn asks the
+        model to write its report immediately. The reason the run stopped is
+        stored in self.stop_reason and on the last research_path entry.
+        """
+        report = "No final report received."
+        for event in self.start_stream(initial_question):
+            if isinstance(event, Stopped):
+                report = event.report
+        return report
+
+    def _stream_step(
+        self, prompt: str, step: int, stage: str = STAGE_QUERY
+    ) -> Iterator[ResearchEvent]:
+        """
+        Send one prompt to the model routed for stage and yield its tokens as
+        events. The final text is available as self.client.last_response
+        afterwards, and the captured chain-of-thought (with a think_store) as
+        self._last_think.
+        """
+        self.messages.append(UserMessage(content=prompt))
+        self._last_think = None
+        think_parts = []
+        body = ""
+        report_start = None
+        report_sent = 0
+        with self._slot(LANE_LLM):
+            for kind, text in self.client.stream(
+                messages=self._request_messages(),
+                verbose=self.verbose,  # color-print chain-of-thought
+                ignore_think=True,  # do not include chain-of-thought in the final text
+                think_budget=self.think_budget,
+                think_budget_action=self.think_budget_action,
+                query_tag=self.query_tag,
+                **self.routing.route(stage).kwargs(),
+            ):
+                if kind == "think":
+                    if self.think_store is not None:
+                        think_parts.append(text)
+                    yield ThinkToken(step, text)
+                    continue
+                yield BodyToken(step, text)
+                body += text
+                if report_start is None and "<report>" in body:
+                    report_start = body.index("<report>") + len("<report>")
+                if report_start is not None:
+                    chunk = body[report_start:].split("</report>")[0][report_sent:]
+                    if chunk:
+                        report_sent += len(chunk)
+                        yield ReportChunk(step, chunk)
+        if think_parts:
+            # Compression and disk writes happen on the store's writer thread
+            self._last_think = self.think_store.submit(
+                f"{self._run_id}/{step}", "".join(think_parts)
+            )
+
+    def start_stream(self, initial_question: str) -> Iterator[ResearchEvent]:
+        """
+        Run the research loop like start(), yielding typed events as they happen:
+        ThinkToken/BodyToken while the model streams, QueryIssued and ToolResult
+        around each tool call, ReportChunk for the report text, StepMetrics after
+        every step and finally Stopped, which carries the report and stop reason.
         """
+        # Branches of a tree run share the tree's tracker
+        tracker = self._shared_tracker or self.budget.tracker()
+        self.stop_reason = None
+        self._begin_job(initial_question[:40])
+        self._run_id = uuid.uuid4().hex[:12]
         current_query = initial_question
+        step = 0
+        prior = self.prior_findings(initial_question)
+        fingerprints = PassageFingerprints() if self.dedup_results else None
+        detector = LoopDetector() if self.loop_detection else None
+        loop_forced = None
+
+        def stopped(
+            entry: dict, reason: str, report: str = "No final report received."
+        ) -> Stopped:
+            self._record_stop(entry, reason, tracker)
+            self._end_summaries()
+            return Stopped(reason, report, tracker.usage())
+
         while True:
-            # Ask the model for the next step using the current_query
-            response = self.search(
-                f"""{current_query}\n\nREMEMBER TO ONLY STICK TO ONE SUB TOPIC FIRST. Write down ONE query."""
-            )
+            exhausted, nearly_exhausted = tracker.begin_step()
+            if exhausted:
+                yield stopped(
+                    {"query": current_query, "assistant_response": "", "results": None},
+                    exhausted,
+                )
+                return
+
+            # Ask the model for the next step using the current_query, or for the
+            # report right away if a budget is nearly used up
+            step += 1
+            step_started = time.monotonic()
+            forced_by = nearly_exhausted or loop_forced
+            if forced_by:
+                force_prompt = FORCE_REPORT_PROMPT.format(reason=forced_by)
+                prompt = f"{current_query}\n\n{force_prompt}"
+            else:
+                prompt = f"""{current_query}\n\nREMEMBER TO ONLY STICK TO ONE SUB TOPIC FIRST. Write down ONE query."""
+            if step == 1 and prior:
+                prior_prompt = PRIOR_FINDINGS_PROMPT.format(
+                    findings=format_prior_findings(prior),
+                    fresh_days=f"{self.knowledge_store.fresh_days:g}",
+                )
+                prompt = f"{prior_prompt}\n\n{prompt}"
+            if self._pending_summaries:
+                self._swap_in_summaries()
+            stage = STAGE_REPORT if forced_by else STAGE_QUERY
+            yield from self._stream_step(prompt, step, stage)
+            response = self.client.last_response
+            output_tokens = self.client.last_output_tokens
+            ttft = self.client.last_ttft
+            tracker.record_step(output_tokens)
+            entry = {
+                "query": current_query,
+                "assistant_response": response,
+                "results": None,
+            }
+            if self._last_think is not None:
+                entry["think"] = self._last_think
+            if self.client.last_think_budget_hits:
+                entry["think_budget_hits"] = self.client.last_think_budget_hits
+            if self.client.last_resumes:
+                entry["stream_resumes"] = self.client.last_resumes
+            if step == 1 and prior:
+                entry["prior_findings"] = {
+                    "fresh": sum(1 for finding in prior if finding["fresh"]),
+                    "stale": sum(1 for finding in prior if not finding["fresh"]),
+                }
 
             # If the assistant ended with a final <report>, we are done
             if "<report>" in response:
-                self.research_path.append(
-                    {
-                        "query": current_query,
-                        "assistant_response": response,
-                        "results": None,
-                    }
+                if forced_by:
+                    entry["forced_by"] = forced_by
+                yield StepMetrics(
+                    step, time.monotonic() - step_started, ttft, output_tokens
+                )
+                self._remember_report(initial_question, response)
+                yield stopped(entry, STOP_REPORT, response)
+                return
+
+            if forced_by:
+                # The model ignored the request to wrap up; do not spend more
+                yield StepMetrics(
+                    step, time.monotonic() - step_started, ttft, output_tokens
                 )
-                return response
+                yield stopped(entry, forced_by)
+                return
 
             # Extract the next query based on the tool being used
-            if self.tool == "search":
-                next_query = extract_query_content(response)
-                if next_query:
-                    results = mock_search_engine(next_query)
-            else:  # neo4j
+            if self.tool == "neo4j":
                 next_query = extract_cypher_content(response)
-                if next_query:
-                    # Use mock_query for development/testing
-                    results = self.tool_client.mock_query(next_query)
-                    # For production:
-                    # results = self.tool_client.execute_query(next_query)
+            else:  # search engine
+                next_query = extract_query_content(response)
 
             if not next_query:
                 # No new query => can't continue
-                self.research_path.append(
-                    {
-                        "query": current_query,
-                        "assistant_response": response,
-                        "results": None,
-                    }
+                yield StepMetrics(
+                    step, time.monotonic() - step_started, ttft, output_tokens
                 )
-                break
+                yield stopped(entry, STOP_NO_QUERY)
+                return
+
+            loop_event = detector.observe_query(next_query, step) if detector else None
+            if loop_event:
+                # A repeated query would only return what was already seen: skip
+                # the tool call and ask for a different query instead
+                entry["loop_event"] = loop_event
+                if loop_event["action"] == ACTION_FORCE_REPORT:
+                    loop_forced = STOP_LOOP
+                self._add_step(entry)
+                self.messages.append(
+                    UserMessage(
+                        content=LOOP_CORRECTION_PROMPT.format(
+                            detail=loop_event["detail"]
+                        )
+                    )
+                )
+                yield StepMetrics(
+                    step, time.monotonic() - step_started, ttft, output_tokens
+                )
+                continue
+
+            if not tracker.claim_tool_call():
+                # Parallel branches used up the tool calls since this step began
+                yield StepMetrics(
+                    step, time.monotonic() - step_started, ttft, output_tokens
+                )
+                yield stopped(entry, STOP_MAX_TOOL_CALLS)
+                return
+
+            yield QueryIssued(step, next_query)
+            tool_started = time.monotonic()
+            with self._slot(LANE_TOOL), span("tool.call", tool=self.tool):
+                if self.tool == "neo4j":
+                    # Use mock_query for development/testing
+                    results = self.tool_client.mock_query(next_query)
+                    # For production:
+                    # results = self.tool_client.execute_query(next_query)
+                else:
+                    results = self.search_engine(next_query)
+                # Custom search engines may still return plain text
+                results = as_result_set(next_query, results)
+            tool_seconds = time.monotonic() - tool_started
+            yield ToolResult(step, next_query, str(results), tool_seconds)
 
             # Store path before we do the search/query
-            self.research_path.append(
-                {
-                    "query": current_query,
-                    "assistant_response": response,
-                    "results": results,
-                }
-            )
+            entry["results"] = self.blob_store.put(str(results))
+            entry["result_count"] = len(results)
+            self._add_step(entry)
 
-            # Feed the results back into the conversation
-            self.messages.append(UserMessage(content=results))
+            # Feed the (packed) results back into the conversation. Unpacked
+            # results resolve to the same blob as the research_path entry.
+            context = self.prepare_results(results, next_query, initial_question)
+            if fingerprints is not None:
+                context, duplicates = dedup_passages(context, step, fingerprints)
+                if duplicates:
+                    entry["duplicates"] = duplicates
+            loop_event = detector.observe_results(results, step) if detector else None
+            if loop_event:
+                entry["loop_event"] = loop_event
+                if loop_event["action"] == ACTION_FORCE_REPORT:
+                    loop_forced = STOP_LOOP
+                correction = LOOP_CORRECTION_PROMPT.format(detail=loop_event["detail"])
+                context = f"{context}\n\n{correction}"
+            self.messages.append(self.blob_store.put(str(context)))
+            if self.summarize_results:
+                self._submit_summary(entry, next_query, initial_question)
+            results = context = None
+            yield StepMetrics(
+                step, time.monotonic() - step_started, ttft, output_tokens, tool_seconds
+            )
 
             # Move on
             current_query = next_query
 
-        return "No final report received."
+    async def astart_stream(
+        self, initial_question: str
+    ) -> AsyncIterator[ResearchEvent]:
+        """
+        Async variant of start_stream(). The blocking research loop runs in a
+        worker thread and its events are handed to the event loop as they occur.
+        Leaving the async iteration early stops the run after the current event.
+        """
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        finished = object()
+        cancelled = threading.Event()
+
+        def publish(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                # The event loop is already closed
+                cancelled.set()
+
+        def produce():
+            events = self.start_stream(initial_question)
+            try:
+                for event in events:
+                    if cancelled.is_set():
+                        break
+                    publish(event)
+            except Exception as e:
+                publish(e)
+            finally:
+                events.close()
+                publish(finished)
+
+        threading.Thread(target=produce, daemon=True).start()
+        try:
+            while True:
+                item = await queue.get()
+                if item is finished:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def _spawn_child(self) -> "ResearchAgent":
+        """
+        Create a sub-agent with the same tool configuration but its own model
+        client and message history. The tool client (e.g. the Neo4j driver) is
+        shared and stays owned by this agent.
+        """
+        child = copy.copy(self)
+        child.client = self._new_client()
+        child.verbose = False
+        child.messages = [SystemMessage(content=self.system_prompt)]
+        child.research_path = []
+        child._owns_tool_client = False
+        child._summary_client = None
+        child._summary_executor = None
+        child._pending_summaries = []
+        return child
+
+    def start_tree(
+        self, initial_question: str, max_subtopics: int = 4, parallelism: int = 4
+    ) -> str:
+        """
+        Research the question as a tree instead of one long conversation:
+        a planning call splits it into sub-topics, each sub-topic is researched
+        by an independent child agent (up to `parallelism` at a time), and a
+        final synthesis call merges the child reports.
+
+        The research_path records a "plan" step, one "branch" step per sub-topic
+        (with the child's own path under "path") and a "synthesis" step.
+
+        The budget covers the whole tree: the planning call, every child step
+        and the synthesis count against one shared tracker, and one step is kept
+        for the synthesis while the children run. If the budget runs out before
+        the synthesis, the child reports are returned as they are.
+        """
+        self._begin_job(initial_question[:40])
+        tracker = self.budget.tracker()
+        self.stop_reason = None
+        exhausted, _ = tracker.begin_step()
+        if exhausted:
+            self._record_stop(
+                {
+                    "type": "plan",
+                    "query": initial_question,
+                    "assistant_response": "",
+                    "results": None,
+                },
+                exhausted,
+                tracker,
+            )
+            return "No final report received."
+        with self._slot(LANE_LLM):
+            plan_response = self.client.complete(
+                messages=[
+                    SystemMessage(
+                        content=PLANNING_PROMPT.format(max_subtopics=max_subtopics)
+                    ),
+                    UserMessage(content=initial_question),
+                ],
+                verbose=self.verbose,
+                ignore_think=True,
+                **self.routing.route(STAGE_PLAN).kwargs(),
+            )
+        tracker.record_step(self.client.last_output_tokens)
+        subtopics = extract_subtopics(plan_response)[:max_subtopics] or [
+            initial_question
+        ]
+        self._add_step(
+            {
+                "type": "plan",
+                "query": initial_question,
+                "assistant_response": plan_response,
+                "results": None,
+                "subtopics": subtopics,
+            }
+        )
+
+        tracker.reserved_steps = 1
+        children = [self._spawn_child() for _ in subtopics]
+        for number, child in enumerate(children, 1):
+            child._shared_tracker = tracker
+            child._graph_chain = LiveGraphExporter.branch_chain(
+                self._graph_chain, number
+            )
+
+        def run_child(child: "ResearchAgent", subtopic: str) -> str:
+            try:
+                return child.start(
+                    SUBTOPIC_QUESTION_TEMPLATE.format(
+                        subtopic=subtopic, question=initial_question
+                    )
+                )
+            except Exception as e:
+                return f"Sub-topic research failed: {e}"
+
+        with ThreadPoolExecutor(max_workers=max(1, parallelism)) as executor:
+            child_reports = list(executor.map(run_child, children, subtopics))
+        tracker.reserved_steps = 0
+
+        for subtopic, child, report in zip(subtopics, children, child_reports):
+            self._add_step(
+                {
+                    "type": "branch",
+                    "query": subtopic,
+                    "assistant_response": report,
+                    "results": None,
+                    "path": child.research_path,
+                }
+            )
+
+        sub_reports = "\n\n".join(
+            f"### Sub-topic {idx}: {subtopic}\n{report}"
+            for idx, (subtopic, report) in enumerate(zip(subtopics, child_reports), 1)
+        )
+        synthesis = {
+            "type": "synthesis",
+            "query": initial_question,
+            "assistant_response": sub_reports,
+            "results": None,
+        }
+        exhausted, _ = tracker.begin_step()
+        if exhausted:
+            self._record_stop(synthesis, exhausted, tracker)
+            return sub_reports
+        with self._slot(LANE_LLM):
+            final_report = self.client.complete(
+                messages=[
+                    SystemMessage(content=SYNTHESIS_PROMPT),
+                    UserMessage(
+                        content=f"Question: {initial_question}\n\n"
+                        f"Sub-topic reports:\n\n{sub_reports}"
+                    ),
+                ],
+                verbose=self.verbose,
+                ignore_think=True,
+                **self.routing.route(STAGE_REPORT).kwargs(),
+            )
+        tracker.record_step(self.client.last_output_tokens)
+        self._remember_report(initial_question, final_report)
+        synthesis["assistant_response"] = final_report
+        self._record_stop(synthesis, STOP_REPORT, tracker)
+        return final_report
 
     def visualize_research_path(self, format: str = "mermaid", output_file: str = None):
         """
@@ -159,6 +856,8 @@ class ResearchAgent:
         print(self.visualize_research_path(format="mermaid"))
 
     def __del__(self):
-        """Clean up Neo4j connection if it exists."""
-        if hasattr(self, "tool_client") and self.tool_client:
+        """Clean up Neo4j connection if it exists and this agent owns it."""
+        if getattr(self, "tool_client", None) and getattr(
+            self, "_owns_tool_client", False
+        ):
             self.tool_client.close()
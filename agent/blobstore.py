@@ -0,0 +1,126 @@
+# blobstore.py
+
+import hashlib
+import shutil
+import tempfile
+import threading
+import weakref
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict
+
+
+class BlobRef:
+    """
+    Reference to a text payload held by a BlobStore.
+
+    str(ref) loads the text (from memory or the compressed spill file), so a ref
+    can be used wherever the payload text is needed.
+    """
+
+    __slots__ = ("store", "digest", "size")
+
+    def __init__(self, store: "BlobStore", digest: str, size: int):
+        self.store = store
+        self.digest = digest
+        self.size = size
+
+    def __str__(self) -> str:
+        return self.store.get(self.digest)
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, BlobRef) and other.digest == self.digest
+
+    def __hash__(self) -> int:
+        return hash(self.digest)
+
+    def __repr__(self) -> str:
+        return f"BlobRef({self.digest[:12]}, {self.size} chars)"
+
+
+class BlobStore:
+    """
+    Content-addressed store for step payloads (tool results, packed context).
+
+    Identical payloads are stored once. Payloads of at least spill_threshold
+    characters are zlib-compressed to files in spill_dir instead of being kept
+    in memory; the last few spilled payloads read are cached.
+
+    Args:
+        spill_dir: Directory for spilled blobs; a temporary directory (removed
+            with the store) is created on first spill if not given
+        spill_threshold: Size in characters from which payloads are spilled
+        cache_size: Number of spilled payloads kept decompressed in memory
+    """
+
+    def __init__(
+        self,
+        spill_dir: str = None,
+        spill_threshold: int = 64 * 1024,
+        cache_size: int = 4,
+    ):
+        self.spill_threshold = spill_threshold
+        self.cache_size = cache_size
+        self._spill_dir = Path(spill_dir) if spill_dir else None
+        self._memory: Dict[str, str] = {}
+        self._spilled: Dict[str, Path] = {}
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "dedup_hits": 0, "spilled_bytes": 0}
+
+    def _spill_path(self, digest: str) -> Path:
+        if self._spill_dir is None:
+            self._spill_dir = Path(tempfile.mkdtemp(prefix="research-blobs-"))
+            # Remove the temporary directory together with the store
+            weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        self._spill_dir.mkdir(parents=True, exist_ok=True)
+        return self._spill_dir / f"{digest}.z"
+
+    def put(self, text: str) -> BlobRef:
+        """Store text (once per distinct content) and return a reference to it."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            self._stats["puts"] += 1
+            if digest in self._memory or digest in self._spilled:
+                self._stats["dedup_hits"] += 1
+            elif len(text) >= self.spill_threshold:
+                path = self._spill_path(digest)
+                compressed = zlib.compress(text.encode("utf-8"), 6)
+                path.write_bytes(compressed)
+                self._spilled[digest] = path
+                self._stats["spilled_bytes"] += len(compressed)
+            else:
+                self._memory[digest] = text
+        return BlobRef(self, digest, len(text))
+
+    def get(self, digest: str) -> str:
+        with self._lock:
+            if digest in self._memory:
+                return self._memory[digest]
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                return self._cache[digest]
+            path = self._spilled[digest]
+
+        text = zlib.decompress(path.read_bytes()).decode("utf-8")
+        with self._lock:
+            self._cache[digest] = text
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return text
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "blobs_in_memory": len(self._memory),
+                "memory_chars": sum(len(text) for text in self._memory.values()),
+                "blobs_spilled": len(self._spilled),
+            }
@@ -0,0 +1,166 @@
+# budget.py
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Stop reasons recorded in the research path
+STOP_REPORT = "report"
+STOP_NO_QUERY = "no_query"
+STOP_MAX_STEPS = "max_steps"
+STOP_DEADLINE = "deadline"
+STOP_MAX_OUTPUT_TOKENS = "max_output_tokens"
+STOP_MAX_TOOL_CALLS = "max_tool_calls"
+STOP_LOOP = "loop_detected"
+
+
+class ResearchBudget:
+    """
+    Hard limits for one research run. Every limit is optional.
+
+    Args:
+        max_steps: Maximum number of model calls in the research loop
+        deadline_seconds: Wall-clock limit for the run, in seconds
+        max_output_tokens: Maximum total completion tokens (thinking included)
+        max_tool_calls: Maximum number of search/Cypher calls
+        margin: Fraction of the token and time budgets kept in reserve for the
+            final report; once it is reached the agent is told to write it
+    """
+
+    def __init__(
+        self,
+        max_steps: int = None,
+        deadline_seconds: float = None,
+        max_output_tokens: int = None,
+        max_tool_calls: int = None,
+        margin: float = 0.15,
+    ):
+        self.max_steps = max_steps
+        self.deadline_seconds = deadline_seconds
+        self.max_output_tokens = max_output_tokens
+        self.max_tool_calls = max_tool_calls
+        self.margin = margin
+
+    def tracker(self) -> "BudgetTracker":
+        """Start tracking a new run against these limits."""
+        return BudgetTracker(self)
+
+
+class BudgetTracker:
+    """
+    Usage of one run against a ResearchBudget.
+
+    A tracker may be shared by agents running in parallel (the branches of a
+    tree run): begin_step() and claim_tool_call() check and claim in one locked
+    operation, so the branches together stay within the limits. Steps that have
+    begun but not been recorded yet, and reserved_steps (kept for a call made
+    after the branches, such as the synthesis), count as used.
+    """
+
+    def __init__(self, budget: ResearchBudget):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.steps = 0
+        self.output_tokens = 0
+        self.tool_calls = 0
+        self.pending_steps = 0
+        self.reserved_steps = 0
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _claimed_steps(self) -> int:
+        return self.steps + self.pending_steps + self.reserved_steps
+
+    def begin_step(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Claim the next model call.
+
+        Returns:
+            (exhausted, nearly_exhausted): the reason the call may not be made
+            (nothing is claimed then), and the reason it should be the last one
+        """
+        with self._lock:
+            exhausted = self.exhausted()
+            if exhausted:
+                return exhausted, None
+            nearly_exhausted = self.nearly_exhausted()
+            self.pending_steps += 1
+            return None, nearly_exhausted
+
+    def record_step(self, output_tokens: int):
+        """Record a model call claimed with begin_step()."""
+        with self._lock:
+            self.pending_steps = max(0, self.pending_steps - 1)
+            self.steps += 1
+            self.output_tokens += output_tokens
+
+    def claim_tool_call(self) -> bool:
+        """Count a search/Cypher call; False if none is left."""
+        with self._lock:
+            budget = self.budget
+            if (
+                budget.max_tool_calls is not None
+                and self.tool_calls >= budget.max_tool_calls
+            ):
+                return False
+            self.tool_calls += 1
+            return True
+
+    def exhausted(self) -> Optional[str]:
+        """The reason no further model call may be made, or None."""
+        budget = self.budget
+        if budget.max_steps is not None and self._claimed_steps() >= budget.max_steps:
+            return STOP_MAX_STEPS
+        if (
+            budget.deadline_seconds is not None
+            and self.elapsed() >= budget.deadline_seconds
+        ):
+            return STOP_DEADLINE
+        if (
+            budget.max_output_tokens is not None
+            and self.output_tokens >= budget.max_output_tokens
+        ):
+            return STOP_MAX_OUTPUT_TOKENS
+        return None
+
+    def nearly_exhausted(self) -> Optional[str]:
+        """
+        The reason the next model call should be the last one, or None.
+
+        A budget is "near" when the next step is the last allowed one, no tool
+        calls are left, or the average step would eat into the reserved margin.
+        """
+        budget = self.budget
+        if (
+            budget.max_steps is not None
+            and self._claimed_steps() + 1 >= budget.max_steps
+        ):
+            return STOP_MAX_STEPS
+        if (
+            budget.max_tool_calls is not None
+            and self.tool_calls >= budget.max_tool_calls
+        ):
+            return STOP_MAX_TOOL_CALLS
+
+        if budget.deadline_seconds is not None:
+            average = self.elapsed() / self.steps if self.steps else 0.0
+            reserve = budget.deadline_seconds * (1.0 - budget.margin)
+            if self.elapsed() + average >= reserve:
+                return STOP_DEADLINE
+
+        if budget.max_output_tokens is not None:
+            average = self.output_tokens / self.steps if self.steps else 0
+            reserve = budget.max_output_tokens * (1.0 - budget.margin)
+            if self.output_tokens + average >= reserve:
+                return STOP_MAX_OUTPUT_TOKENS
+        return None
+
+    def usage(self) -> Dict:
+        return {
+            "steps": self.steps,
+            "output_tokens": self.output_tokens,
+            "tool_calls": self.tool_calls,
+            "elapsed_seconds": round(self.elapsed(), 3),
+        }
@@ -1,11 +1,70 @@
 # deepseek_client.py
 
+import logging
 import os
+import queue
+import threading
+import time
+from typing import Generator, Iterator, Optional, Tuple
 
 from azure.ai.inference import ChatCompletionsClient
+from azure.ai.inference.models import AssistantMessage, UserMessage
 from azure.core.credentials import AzureKeyCredential
+from azure.core.exceptions import IncompleteReadError, ServiceResponseError
 
-from agent.utils import parse_and_print_token
+from agent.prompts import THINK_BUDGET_NUDGE_PROMPT
+from agent.routing import DEFAULT_MODEL
+from agent.tracing import get_tracer, span
+from agent.utils import (
+    estimate_tokens,
+    parse_and_print_token,
+    split_think_segments,
+)
+
+# What stream() does when a response exceeds its think budget
+THINK_BUDGET_NUDGE = "nudge"
+THINK_BUDGET_CONTINUE = "continue"
+
+# Default seconds without a new token, and for one whole request, before a
+# stream is given up on
+STALL_TIMEOUT = 60.0
+REQUEST_TIMEOUT = 600.0
+
+
+class StreamTimeoutError(TimeoutError):
+    """A streamed response stalled or ran past its deadline."""
+
+
+# Failures of a running stream that are resumed instead of raised
+RESUMABLE_ERRORS = (
+    StreamTimeoutError,
+    ConnectionError,
+    ServiceResponseError,
+    IncompleteReadError,
+)
+
+
+# Thread name of a stalled stream's reader, and of the thread closing it
+ABANDONED_READER_NAME = "llm-stream-abandoned"
+
+
+class _AbandonedStreamFilter(logging.Filter):
+    """Drops the transport's "Unable to stream download." of abandoned streams."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.threadName != ABANDONED_READER_NAME
+
+
+logging.getLogger("azure.core.pipeline.transport._requests_basic").addFilter(
+    _AbandonedStreamFilter()
+)
+
+
+def _close_quietly(close):
+    try:
+        close()
+    except Exception:
+        pass
 
 
 class DeepseekClient:
@@ -13,47 +72,365 @@ class DeepseekClient:
     Handles streaming responses from the model.
     If ignore_think=True, we do not add <think> content to the final text
     (but still color-print it if verbose=True).
+    After each call, last_output_tokens holds the completion tokens it used
+    (reported by the service when available, estimated otherwise).
+
+    Streams are read by a background thread, so a connection that stops
+    delivering tokens cannot hang the caller. When no token arrives for
+    stall_timeout seconds, a request takes longer than request_timeout seconds,
+    or the connection drops, the response is requested again with the partial
+    output as an assistant prefix to continue from, at most max_resumes times
+    per call; after that StreamTimeoutError (or the connection error) is raised.
+    None disables a timeout. A request that fails before streaming anything is
+    simply sent again.
+
+    Resuming relies on the service continuing a trailing assistant message
+    (prefill). Endpoints that answer it with a new message instead repeat the
+    start of the response, which is then appended to the partial output twice;
+    pass max_resumes=0 for such deployments to raise instead.
+
+    Args:
+        stall_timeout: Seconds to wait for the next token
+        request_timeout: Seconds one streamed request may take in total
+        max_resumes: Resumed requests per call before giving up (0 disables
+            resuming)
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        stall_timeout: float = STALL_TIMEOUT,
+        request_timeout: float = REQUEST_TIMEOUT,
+        max_resumes: int = 2,
+    ):
         endpoint = os.environ["AZURE_DEEPSEEK_ENDPOINT"]
         api_key = os.environ["AZURE_DEEPSEEK_API_KEY"]
         self.client = ChatCompletionsClient(
             endpoint=endpoint,
             credential=AzureKeyCredential(api_key),
         )
+        self.last_response = ""
+        self.last_output_tokens = 0
+        self.last_ttft = None
+        self.last_think_budget_hits = 0
+        self.last_resumes = 0
+        self.stall_timeout = stall_timeout
+        self.request_timeout = request_timeout
+        self.max_resumes = max_resumes
 
-    def complete(
+    def stream(
         self,
         messages: list,
-        model: str = "Analysis-POC-DeepSeek-R1",
+        model: str = DEFAULT_MODEL,
         verbose: bool = False,
         ignore_think: bool = False,
         temperature: float = 0.5,
-    ):
-        # Stream the response
-        response_gen = self.client.complete(
-            messages=messages,
-            model=model,
-            stream=True,
-            temperature=temperature,
-            stop=["</query>", "</report>"],
-        )
+        max_tokens: int = None,
+        think_budget: int = None,
+        think_budget_action: str = THINK_BUDGET_NUDGE,
+        query_tag: str = "query",
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Stream the response as ("think", text) and ("body", text) segments.
+
+        Printing and the ignore_think handling of the final text are the same as
+        in complete(). Once the generator is exhausted, last_response holds the
+        final text, last_output_tokens the completion tokens and last_ttft the
+        seconds until the first content token arrived.
+
+        model, temperature and max_tokens are usually taken from a StageRoute
+        (see agent.routing); None leaves the setting to the service.
+
+        With a think_budget, a response whose <think> section grows beyond that
+        many (estimated) tokens is aborted and requested once more without a
+        budget: with think_budget_action "nudge" the reasoning is dropped and the
+        model is told to answer right away (with a <query_tag> element, e.g.
+        "cypher" for the Neo4j tool), with "continue" the truncated reasoning is
+        sent back as an assistant message to answer from.
+        last_think_budget_hits counts the aborts, last_resumes the requests
+        resumed after a stall, timeout or dropped connection.
+        """
+        if think_budget_action not in (THINK_BUDGET_NUDGE, THINK_BUDGET_CONTINUE):
+            raise ValueError('think_budget_action must be "nudge" or "continue"')
+        tracer = get_tracer()
+        started = time.perf_counter()
+        self.last_response = ""
+        self.last_ttft = None
+        self.last_output_tokens = 0
+        self.last_think_budget_hits = 0
+        self.last_resumes = 0
+        request_messages = messages
+
+        while True:
+            truncated_think = yield from self._stream_attempt(
+                request_messages,
+                model,
+                verbose,
+                ignore_think,
+                temperature,
+                max_tokens,
+                think_budget,
+                started,
+            )
+            if truncated_think is None:
+                return
+
+            self.last_think_budget_hits += 1
+            tracer.instant(
+                "llm.think_budget_exceeded",
+                think_budget=think_budget,
+                action=think_budget_action,
+            )
+            request_messages = list(messages)
+            if think_budget_action == THINK_BUDGET_CONTINUE:
+                request_messages.append(
+                    AssistantMessage(content=f"<think>{truncated_think}</think>")
+                )
+            request_messages.append(
+                UserMessage(content=THINK_BUDGET_NUDGE_PROMPT.format(tag=query_tag))
+            )
+            # The retry runs without a budget so that the step always completes
+            think_budget = None
+
+    def _stream_attempt(
+        self,
+        messages: list,
+        model: str,
+        verbose: bool,
+        ignore_think: bool,
+        temperature: float,
+        max_tokens: int,
+        think_budget: int,
+        started: float,
+    ) -> Generator[Tuple[str, str], None, Optional[str]]:
+        """
+        One streamed response of stream(), resumed across requests when the
+        stream fails. Returns None when the response was read to the end, or the
+        reasoning so far when the think budget ran out.
+        """
+        tracer = get_tracer()
+        attempt_started = time.perf_counter()
+        think_started = think_ended = None
+        truncated_think = None
 
         full_response = ""
+        streamed_text = ""
+        think_text = ""
+        reported_tokens = None
         inside_think = False
 
-        for token in response_gen:
-            if not token["choices"]:
-                continue
+        try:
+            while True:
+                # A resumed request continues from the text streamed so far
+                request_messages = messages
+                request_max_tokens = max_tokens
+                if streamed_text:
+                    request_messages = list(messages) + [
+                        AssistantMessage(content=streamed_text)
+                    ]
+                    if max_tokens is not None:
+                        used = estimate_tokens(streamed_text)
+                        request_max_tokens = max(max_tokens - used, 1)
+                request_text = ""
+                reported_tokens = None
+                tokens = None
+                try:
+                    # Failing to open the request is resumed like a failing stream
+                    response_gen = self.client.complete(
+                        messages=request_messages,
+                        model=model,
+                        stream=True,
+                        temperature=temperature,
+                        max_tokens=request_max_tokens,
+                        stop=["</query>", "</report>"],
+                    )
+                    tokens = self._read_stream(response_gen)
+                    for token in tokens:
+                        usage = token.get("usage")
+                        if usage and usage.get("completion_tokens"):
+                            reported_tokens = usage["completion_tokens"]
+                        if not token["choices"]:
+                            continue
 
-            token_text = token["choices"][0]["delta"].get("content", "")
-            if not token_text:
-                continue
+                        token_text = token["choices"][0]["delta"].get("content", "")
+                        if not token_text:
+                            continue
+                        if self.last_ttft is None:
+                            self.last_ttft = time.perf_counter() - started
 
-            processed_text, inside_think = parse_and_print_token(
-                token_text, inside_think, ignore_think, verbose
-            )
-            full_response += processed_text
+                        streamed_text += token_text
+                        request_text += token_text
+                        segments, now_inside = split_think_segments(
+                            token_text, inside_think
+                        )
+                        if now_inside != inside_think:
+                            # Phase boundaries for the trace: entering or
+                            # leaving <think>
+                            if now_inside and think_started is None:
+                                think_started = time.perf_counter()
+                            elif not now_inside and think_ended is None:
+                                think_ended = time.perf_counter()
+                        processed_text, inside_think = parse_and_print_token(
+                            token_text, inside_think, ignore_think, verbose
+                        )
+                        full_response += processed_text
+                        self.last_response = full_response
+                        for in_think, text in segments:
+                            if in_think:
+                                think_text += text
+                            yield ("think" if in_think else "body"), text
+
+                        if (
+                            think_budget is not None
+                            and inside_think
+                            and estimate_tokens(think_text) > think_budget
+                        ):
+                            truncated_think = think_text
+                            self.last_response = ""
+                            break
+                except RESUMABLE_ERRORS as e:
+                    # The partial output was paid for already: count it and
+                    # continue from it instead of starting over
+                    self.last_output_tokens += estimate_tokens(request_text)
+                    if self.last_resumes >= self.max_resumes:
+                        raise
+                    self.last_resumes += 1
+                    tracer.instant(
+                        "llm.stream_resumed",
+                        error=type(e).__name__,
+                        resumes=self.last_resumes,
+                        prefix_tokens=estimate_tokens(streamed_text),
+                    )
+                    continue
+                finally:
+                    if tokens is not None:
+                        tokens.close()
 
-        return full_response
+                if truncated_think is not None or reported_tokens is None:
+                    # Aborted or unreported responses are estimated from their text
+                    self.last_output_tokens += estimate_tokens(request_text)
+                else:
+                    self.last_output_tokens += reported_tokens
+                break
+        finally:
+            if tracer.enabled:
+                ended = time.perf_counter()
+                if self.last_ttft is not None and not self.last_think_budget_hits:
+                    tracer.record("llm.first_token", started, started + self.last_ttft)
+                if think_started is not None:
+                    tracer.record(
+                        "llm.think",
+                        think_started,
+                        think_ended or ended,
+                        budget_exceeded=truncated_think is not None,
+                    )
+                tracer.record(
+                    "llm.stream",
+                    attempt_started,
+                    ended,
+                    model=model,
+                    output_tokens=self.last_output_tokens,
+                    resumes=self.last_resumes,
+                )
+        return truncated_think
+
+    def _read_stream(self, response_gen) -> Iterator[dict]:
+        """
+        Yield the chunks of response_gen as a background thread receives them,
+        raising StreamTimeoutError when the next chunk takes longer than
+        stall_timeout or the request as a whole longer than request_timeout.
+        Closing the generator abandons the response.
+        """
+        chunks = queue.Queue()
+        stopped = threading.Event()
+        finished = object()
+
+        close = getattr(response_gen, "close", None)
+
+        def read():
+            try:
+                for chunk in response_gen:
+                    if stopped.is_set():
+                        return
+                    chunks.put((chunk, None))
+                chunks.put((finished, None))
+            except BaseException as e:
+                chunks.put((None, e))
+            finally:
+                # The thread iterating the response releases it, also when the
+                # consumer stopped early (e.g. after a think budget abort)
+                if close is not None:
+                    _close_quietly(close)
+
+        reader = threading.Thread(target=read, name="llm-stream-reader", daemon=True)
+        reader.start()
+        stalled = False
+        deadline = None
+        if self.request_timeout is not None:
+            deadline = time.monotonic() + self.request_timeout
+        try:
+            while True:
+                wait = self.stall_timeout
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        stalled = True
+                        raise StreamTimeoutError(
+                            f"response not complete after {self.request_timeout:g}s"
+                        )
+                    if wait is None or remaining < wait:
+                        wait = remaining
+                try:
+                    chunk, error = chunks.get(timeout=wait)
+                except queue.Empty:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        continue
+                    stalled = True
+                    raise StreamTimeoutError(
+                        f"no token received for {self.stall_timeout:g}s"
+                    ) from None
+                if error is not None:
+                    raise error
+                if chunk is finished:
+                    return
+                yield chunk
+        finally:
+            stopped.set()
+            if stalled and close is not None and reader.is_alive():
+                # The reader is blocked on the stalled socket and would hold the
+                # connection until it times out. Closing it would block this
+                # thread as well, so another thread does; the transport's
+                # warning about the interrupted download is expected then.
+                reader.name = ABANDONED_READER_NAME
+                threading.Thread(
+                    target=_close_quietly,
+                    args=(close,),
+                    name=ABANDONED_READER_NAME,
+                    daemon=True,
+                ).start()
+
+    def complete(
+        self,
+        messages: list,
+        model: str = DEFAULT_MODEL,
+        verbose: bool = False,
+        ignore_think: bool = False,
+        temperature: float = 0.5,
+        max_tokens: int = None,
+        think_budget: int = None,
+        think_budget_action: str = THINK_BUDGET_NUDGE,
+        query_tag: str = "query",
+    ):
+        with span("llm.complete", model=model):
+            for _ in self.stream(
+                messages=messages,
+                model=model,
+                verbose=verbose,
+                ignore_think=ignore_think,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                think_budget=think_budget,
+                think_budget_action=think_budget_action,
+                query_tag=query_tag,
+            ):
+                pass
+        return self.last_response
@@ -0,0 +1,276 @@
+# evaluate.py
+
+import argparse
+import json
+import os
+import re
+import time
+from typing import Dict, List
+
+from agent.events import BodyToken, StepMetrics, Stopped, ThinkToken
+from agent.fake_inference import FakeInferenceServer
+from agent.jobs import default_agent_factory
+from agent.utils import CITATION_RE, estimate_tokens
+
+# Fixed question set. Each sub-topic is a group of alternative keywords, at least
+# one of which the report has to mention; entities have to appear verbatim.
+QUESTIONS = [
+    {
+        "id": "solana",
+        "question": "Is Solana a good investment?",
+        "tool": "synthetic",
+        "subtopics": [
+            ["price", "valuation", "market"],
+            ["risk", "outage", "regulat"],
+            ["ecosystem", "adoption", "developer", "defi"],
+        ],
+        "entities": ["Solana"],
+    },
+    {
+        "id": "memecoin_kols",
+        "question": (
+            "Among the memecoins DOGEX, HONK, and MOO, which one is most favored by "
+            "prime KOLs? Also, list any high-weight wallets (weight ≥ 0.8) that hold "
+            "or develop it, check if it’s been bridged via Wormhole, and show me "
+            "relevant tweets (including retweets) about it."
+        ),
+        "tool": "neo4j",
+        "subtopics": [["kol"], ["wallet"], ["wormhole", "bridge"], ["tweet"]],
+        "entities": ["DOGEX", "HONK", "MOO", "Wormhole"],
+    },
+]
+
+# Agent configurations compared by default (ResearchAgent/job options)
+CONFIGS = {
+    "baseline": {},
+    "packed": {"result_token_budget": 400},
+    "dedup": {"dedup_results": True},
+    "summarized": {"summarize_results": True},
+    "loops": {"loop_detection": True},
+    # Below the ~60 tokens of reasoning per step of the fake server
+    "think_budget": {"think_budget": 30},
+}
+
+# Default prices in USD per million tokens; set them to your deployment's rates
+INPUT_PRICE = 1.35
+OUTPUT_PRICE = 5.40
+
+TABLE_COLUMNS = [
+    ("question", "question"),
+    ("config", "config"),
+    ("stop", "stop_reason"),
+    ("steps", "steps"),
+    ("in_tok", "input_tokens"),
+    ("out_tok", "output_tokens"),
+    ("seconds", "seconds"),
+    ("cost_usd", "cost_usd"),
+    ("coverage", "coverage"),
+    ("citations", "citations"),
+    ("entities", "entities"),
+]
+# Report quality columns; marked as synthetic when the fake server wrote the reports
+QUALITY_COLUMNS = ("coverage", "citations", "entities")
+SYNTHETIC_NOTE = (
+    "\\* synthetic: the reports were written by the fake inference server from "
+    "the findings in the agent's context, not by a model"
+)
+
+
+def check_report(report: str, question: Dict) -> Dict:
+    """Quality checks of a report against the expectations of its question."""
+    text = report.lower()
+    covered = sum(
+        1
+        for keywords in question["subtopics"]
+        if any(keyword in text for keyword in keywords)
+    )
+    found = [
+        entity
+        for entity in question["entities"]
+        if re.search(rf"\b{re.escape(entity.lower())}\b", text)
+    ]
+    return {
+        "coverage": f"{covered}/{len(question['subtopics'])}",
+        "citations": len(CITATION_RE.findall(report)),
+        "entities": f"{len(found)}/{len(question['entities'])}",
+        "missing_entities": [e for e in question["entities"] if e not in found],
+    }
+
+
+def run_question(
+    question: Dict, options: Dict, input_price: float, output_price: float
+) -> Dict:
+    """
+    Run one question under one configuration. Input tokens are estimated from
+    the conversation sent at each research step (auxiliary calls such as result
+    summaries are not included).
+    """
+    options = {"tool": question["tool"], **options}
+    record = {
+        "question": question["id"],
+        "steps": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "stop_reason": None,
+        "error": None,
+    }
+    report = ""
+    started = time.monotonic()
+    try:
+        agent = default_agent_factory(options)
+        counted_step = 0
+        for event in agent.start_stream(question["question"]):
+            if isinstance(event, (ThinkToken, BodyToken)) and event.step > counted_step:
+                # The first token of a step: the request holds the conversation
+                counted_step = event.step
+                record["input_tokens"] += sum(
+                    estimate_tokens(str(message.content))
+                    for message in agent._request_messages()
+                )
+            elif isinstance(event, StepMetrics):
+                record["steps"] += 1
+                record["output_tokens"] += event.output_tokens
+            elif isinstance(event, Stopped):
+                record["stop_reason"] = event.reason
+                report = event.report
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = round(time.monotonic() - started, 3)
+    record["cost_usd"] = round(
+        (record["input_tokens"] * input_price + record["output_tokens"] * output_price)
+        / 1e6,
+        5,
+    )
+    record.update(check_report(report, question))
+    return record
+
+
+def format_table(records: List[Dict], synthetic: bool = False) -> str:
+    """
+    Markdown table of the records, one row per question and configuration.
+    With synthetic, the quality columns are starred and a note explains why.
+    """
+    headers = [
+        f"{header}\\*" if synthetic and header in QUALITY_COLUMNS else header
+        for header, _ in TABLE_COLUMNS
+    ]
+    lines = [
+        "| " + " | ".join(headers) + " |",
+        "|" + "|".join("---" for _ in TABLE_COLUMNS) + "|",
+    ]
+    for record in records:
+        cells = [str(record.get(key, "")) for _, key in TABLE_COLUMNS]
+        lines.append("| " + " | ".join(cells) + " |")
+    if synthetic:
+        lines.extend(["", SYNTHETIC_NOTE])
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a fixed question set under several agent configurations "
+        "and compare speed, cost and report quality"
+    )
+    parser.add_argument(
+        "--configs",
+        default=",".join(CONFIGS),
+        help="Comma-separated configuration names (built-in or from --config-file)",
+    )
+    parser.add_argument(
+        "--config-file",
+        default=None,
+        help='JSON file of extra configurations, e.g. {"routed": {"routing": {...}}}',
+    )
+    parser.add_argument(
+        "--questions",
+        default=",".join(question["id"] for question in QUESTIONS),
+        help="Comma-separated question ids",
+    )
+    parser.add_argument(
+        "--endpoint",
+        default=None,
+        help="Inference endpoint to use; by default a local fake server is started",
+    )
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument("--tokens-per-second", type=float, default=400.0)
+    parser.add_argument("--report-after", type=int, default=3)
+    parser.add_argument("--input-price", type=float, default=INPUT_PRICE)
+    parser.add_argument("--output-price", type=float, default=OUTPUT_PRICE)
+    parser.add_argument("--output", default="output/eval")
+    args = parser.parse_args()
+
+    configs = dict(CONFIGS)
+    if args.config_file:
+        with open(args.config_file, encoding="utf-8") as f:
+            configs.update(json.load(f))
+    config_names = [name.strip() for name in args.configs.split(",") if name.strip()]
+    unknown = [name for name in config_names if name not in configs]
+    if unknown:
+        parser.error(f"unknown configurations: {', '.join(unknown)}")
+    question_ids = {qid.strip() for qid in args.questions.split(",")}
+    questions = [question for question in QUESTIONS if question["id"] in question_ids]
+
+    fake = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        fake = FakeInferenceServer(
+            ttft=args.ttft,
+            tokens_per_second=args.tokens_per_second,
+            report_after=args.report_after,
+        ).start()
+        endpoint = fake.url
+        os.environ.setdefault("AZURE_DEEPSEEK_API_KEY", "fake-key")
+        # The Neo4j tool runs mocked queries; the driver never connects
+        os.environ.setdefault("NEO4J_URI", "bolt://localhost:7687")
+        os.environ.setdefault("NEO4J_USERNAME", "neo4j")
+        os.environ.setdefault("NEO4J_PASSWORD", "fake-password")
+    os.environ["AZURE_DEEPSEEK_ENDPOINT"] = endpoint
+
+    records = []
+    try:
+        for question in questions:
+            for name in config_names:
+                record = run_question(
+                    question, configs[name], args.input_price, args.output_price
+                )
+                record["config"] = name
+                records.append(record)
+                print(
+                    f"{question['id']:<16} {name:<14} steps={record['steps']:<3} "
+                    f"seconds={record['seconds']:<7} coverage={record['coverage']} "
+                    f"citations={record['citations']}"
+                    + (f"  error={record['error']}" if record["error"] else "")
+                )
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    table = format_table(records, synthetic=fake is not None)
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(f"{args.output}.md", "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "config": {
+                    "endpoint": "fake" if fake is not None else endpoint,
+                    "synthetic_quality": fake is not None,
+                    "input_price": args.input_price,
+                    "output_price": args.output_price,
+                    "configs": {name: configs[name] for name in config_names},
+                },
+                "results": records,
+            },
+            f,
+            indent=2,
+            sort_keys=True,
+        )
+    print()
+    print(table)
+    print(f"Evaluation results saved to: {args.output}.md, {args.output}.json")
+
+
+if __name__ == "__main__":
+    main()
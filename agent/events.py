@@ -0,0 +1,84 @@
+# events.py
+
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass
+class ResearchEvent:
+    """Base class of the events yielded by ResearchAgent.start_stream()."""
+
+    type = "event"
+
+    def to_dict(self) -> Dict:
+        """JSON-serializable form, with the event type under "type"."""
+        return {"type": self.type, **asdict(self)}
+
+
+@dataclass
+class ThinkToken(ResearchEvent):
+    """Chain-of-thought text streamed by the model."""
+
+    type = "think"
+    step: int
+    text: str
+
+
+@dataclass
+class BodyToken(ResearchEvent):
+    """Visible (non-think) text streamed by the model, tags included."""
+
+    type = "body"
+    step: int
+    text: str
+
+
+@dataclass
+class QueryIssued(ResearchEvent):
+    """The model asked for a search or Cypher query."""
+
+    type = "query"
+    step: int
+    query: str
+
+
+@dataclass
+class ToolResult(ResearchEvent):
+    """Raw output of the search engine or Neo4j for a query."""
+
+    type = "tool_result"
+    step: int
+    query: str
+    results: str
+    seconds: float
+
+
+@dataclass
+class StepMetrics(ResearchEvent):
+    """Timing and size of one research step."""
+
+    type = "step_metrics"
+    step: int
+    seconds: float
+    ttft_seconds: Optional[float]
+    output_tokens: int
+    tool_seconds: float = 0.0
+
+
+@dataclass
+class ReportChunk(ResearchEvent):
+    """Text inside <report>; repeats the body text as it streams in."""
+
+    type = "report"
+    step: int
+    text: str
+
+
+@dataclass
+class Stopped(ResearchEvent):
+    """The run ended. Always the last event."""
+
+    type = "stopped"
+    reason: str
+    report: str
+    usage: Dict = field(default_factory=dict)
@@ -0,0 +1,426 @@
+# fake_inference.py
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from agent.results import FENCED_BLOCK_RE
+from agent.utils import CITATION_RE, format_search_results, tokenize
+
+# Request headers that override the server defaults for a single request
+HEADER_TTFT = "x-fake-ttft"
+HEADER_TOKENS_PER_SECOND = "x-fake-tokens-per-second"
+HEADER_ERROR_RATE = "x-fake-error-rate"
+HEADER_RATE_LIMIT_RATE = "x-fake-429-rate"
+
+THINK_FILLER = (
+    "Let me consider which sub topic still lacks verified sources and what the "
+    "most specific query for it would be before moving on"
+).split()
+
+NOT_FOUND = {"error": {"code": "NotFound", "message": "Not found"}}
+
+STREAM_TOKEN_RE = re.compile(r"</?\w+>|[^<\s]+\s*|\s+")
+
+YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+LIST_PREFIX_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(?:\[[^\]]*\]\s*)?")
+
+# The start of THINK_BUDGET_NUDGE_PROMPT
+NUDGE_MARKER = "reasoning budget for this step is used up"
+
+
+def context_findings(user_messages: List[str], limit: int = 8) -> List[str]:
+    """
+    Findings the fake model can report from its context, each with a citation:
+    the first sentence of every ```search N``` hit, the rows of ```result```
+    blocks, and cited lines such as result summaries, prior findings and
+    sub-topic reports.
+    """
+    findings = []
+    for content in user_messages:
+        for match in FENCED_BLOCK_RE.finditer(content):
+            label, body = match.group(1).strip(), match.group(2).strip()
+            year = (YEAR_RE.findall(body) or ["2024"])[0]
+            source = "Neo4j" if label == "result" else "search results"
+            if body.startswith("Source:"):
+                header, _, body = body.partition("\n")
+                source = header[len("Source:") :].strip() or source
+            lines = [line.strip() for line in body.splitlines()]
+            if label == "result":
+                facts = [line for line in lines if line.startswith("[")]
+            else:
+                text = " ".join(line for line in lines if line)
+                facts = re.split(r"(?<=[.!?])\s+", text)[:1]
+            for fact in facts:
+                if fact and not fact.startswith("(same as"):
+                    year = (YEAR_RE.findall(fact) or [year])[0]
+                    findings.append(f"{fact.rstrip('.')} ({source}, {year}).")
+        outside = FENCED_BLOCK_RE.sub("", content)
+        for line in outside.splitlines():
+            if CITATION_RE.search(line):
+                findings.append(LIST_PREFIX_RE.sub("", line).strip())
+    return list(dict.fromkeys(findings))[:limit]
+
+
+class FakeInferenceServer:
+    """
+    Local stand-in for the Azure AI Inference chat completions endpoint.
+
+    Point AZURE_DEEPSEEK_ENDPOINT at url to use it. Responses stream as SSE
+    chunks in the format ChatCompletionsClient expects: a <think> section
+    followed by a <query>/<cypher> for research turns, a <report> once
+    report_after steps are done (or when the prompt asks for the report), and
+    ```search N``` blocks for the mock search engine prompt and a bullet list for
+    the result summarization prompt. The report lists the cited findings that
+    reached the conversation (see context_findings()), so what a configuration
+    keeps in the context shows in its report. Stop sequences are honoured like
+    the real service: output ends before the first match.
+
+    Args:
+        host, port: Address to bind; port 0 picks a free port
+        ttft: Seconds before the first token of each response
+        tokens_per_second: Streaming rate after the first token (0 = unlimited)
+        error_rate: Probability of answering a request with HTTP 500
+        rate_limit_rate: Probability of answering a request with HTTP 429
+        think_words: Words of chain-of-thought per response
+        report_after: Research steps before the fake model writes its report
+        seed: Seed of the random generator deciding errors and wording
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttft: float = 0.2,
+        tokens_per_second: float = 50.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        think_words: int = 40,
+        report_after: int = 3,
+        seed: int = 0,
+    ):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.think_words = think_words
+        self.report_after = report_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "tokens": 0,
+        }
+
+        handler = type("BoundFakeInferenceHandler", (_FakeInferenceHandler,), {})
+        handler.fake = self
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeInferenceServer":
+        """Serve in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def count(self, key: str, amount: int = 1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    def compose(self, messages: List[Dict]) -> str:
+        """The full (unstopped) response text the fake model gives to a conversation."""
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user_messages = [m["content"] for m in messages if m["role"] == "user"]
+        think_words = [
+            THINK_FILLER[i % len(THINK_FILLER)] for i in range(self.think_words)
+        ]
+        think = f"<think>{' '.join(think_words)}</think>\n\n"
+        if user_messages and NUDGE_MARKER in user_messages[-1]:
+            # A think budget nudge: answer the step it interrupted, right away
+            user_messages = user_messages[:-1]
+            think = "<think>Writing the answer now.</think>\n\n"
+        last = user_messages[-1] if user_messages else ""
+        keywords = tokenize(last.split("\n\n")[0])[:6] or ["research"]
+
+        if "search engine results mocker" in system:
+            paragraphs = [
+                f"Result {idx} on {' '.join(keywords)}: according to Reuters (2024), "
+                f"{keywords[idx % len(keywords)]} remains a closely watched topic."
+                for idx in range(1, 6)
+            ]
+            return think + format_search_results(paragraphs)
+        if "condense search engine or knowledge graph results" in system:
+            facts = [
+                line.strip()
+                for line in last.split("Results:", 1)[-1].splitlines()
+                if line.strip() and not line.startswith("```")
+            ]
+            return think + "\n".join(
+                f"- {' '.join(fact.split()[:16])} (Reuters, 2024)" for fact in facts[:5]
+            )
+        if "<subtopic>" in system:
+            subtopics = "\n".join(
+                f"<subtopic>{' '.join(keywords)} aspect {idx}</subtopic>"
+                for idx in range(1, 4)
+            )
+            return think + subtopics
+
+        # Every research step adds a prompt and (except the first) a tool result
+        step = (len(user_messages) + 1) // 2
+        wants_report = "BUDGET" in last or "Sub-topic reports" in last
+        question = user_messages[0].split("\n\n")[0] if user_messages else ""
+        if wants_report or step > self.report_after:
+            # Report only what reached the context; nothing is taken from the
+            # question, so the report's quality depends on the agent's context
+            findings = context_findings(user_messages)
+            lines = "\n".join(f"{n}. {f}" for n, f in enumerate(findings, 1))
+            return (
+                f"{think}<report>**Research report**\n"
+                f"{lines or 'No findings in context.'}\n"
+                "**Unresolved**: Generated by the fake inference server.</report>"
+            )
+        # Research turns work through the terms of the question, three per step
+        terms = tokenize(question) or keywords
+        focus = list(
+            dict.fromkeys(terms[(3 * (step - 1) + i) % len(terms)] for i in range(3))
+        )
+        if "Cypher" in system:
+            names = ", ".join(f"'{term}'" for term in focus)
+            return (
+                f"{think}<cypher>MATCH (n) WHERE n.name IN [{names}] "
+                "RETURN n LIMIT 5</cypher>"
+            )
+        return f"{think}<query>{' '.join(focus)} step {step}</query>"
+
+
+def apply_stop(text: str, stop: List[str]) -> str:
+    """Cut text before the first occurrence of any stop sequence."""
+    cut = len(text)
+    for sequence in stop or []:
+        idx = text.find(sequence)
+        if idx != -1:
+            cut = min(cut, idx)
+    return text[:cut]
+
+
+class _FakeInferenceHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 so that streamed replies can be sent chunk by chunk; with HTTP/1.0
+    # clients buffer the body until the connection closes
+    protocol_version = "HTTP/1.1"
+    fake: FakeInferenceServer = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            # Clients drop kept-alive connections between requests
+            pass
+
+    def _override(self, header: str, default: float) -> float:
+        value = self.headers.get(header)
+        return float(value) if value is not None else default
+
+    def _send_json(self, status: int, data: Dict, headers: Dict = None):
+        payload = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path.split("?")[0].rstrip("/") == "/stats":
+            self._send_json(200, self.fake.stats())
+        else:
+            self._send_json(404, NOT_FOUND)
+
+    def _send_chunk(self, data: bytes):
+        """Write one chunk of a Transfer-Encoding: chunked body and flush it."""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        fake = self.fake
+        # Read the body first so the kept-alive connection stays in sync
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        if self.path.split("?")[0].rstrip("/") != "/chat/completions":
+            self._send_json(404, NOT_FOUND)
+            return
+
+        fake.count("requests")
+        request = json.loads(body or b"{}")
+
+        if fake.roll() < self._override(HEADER_RATE_LIMIT_RATE, fake.rate_limit_rate):
+            fake.count("rate_limited")
+            self._send_json(
+                429,
+                {"error": {"code": "429", "message": "Rate limit exceeded (fake)"}},
+                {"Retry-After": "0"},
+            )
+            return
+        if fake.roll() < self._override(HEADER_ERROR_RATE, fake.error_rate):
+            fake.count("errors")
+            self._send_json(
+                500,
+                {"error": {"code": "InternalServerError", "message": "Fake failure"}},
+            )
+            return
+
+        text = fake.compose(request.get("messages", []))
+        text = apply_stop(text, request.get("stop"))
+        tokens = STREAM_TOKEN_RE.findall(text)
+        ttft = self._override(HEADER_TTFT, fake.ttft)
+        rate = self._override(HEADER_TOKENS_PER_SECOND, fake.tokens_per_second)
+        model = request.get("model", "fake-model")
+        completion_id = f"fake-{uuid.uuid4().hex[:12]}"
+
+        if not request.get("stream"):
+            time.sleep(ttft + (len(tokens) / rate if rate > 0 else 0.0))
+            fake.count("completed")
+            fake.count("tokens", len(tokens))
+            self._send_json(
+                200,
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        "prompt_tokens": 0,
+                        "completion_tokens": len(tokens),
+                        "total_tokens": len(tokens),
+                    },
+                },
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def chunk(delta: Dict, finish_reason: str = None, usage: Dict = None) -> bytes:
+            data = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+            }
+            if usage:
+                data["usage"] = usage
+            return f"data: {json.dumps(data)}\n\n".encode("utf-8")
+
+        try:
+            time.sleep(ttft)
+            self._send_chunk(chunk({"role": "assistant", "content": ""}))
+            started = time.monotonic()
+            for idx, token in enumerate(tokens, 1):
+                if rate > 0:
+                    # Sleep until this token is due instead of a fixed delay per
+                    # token, so slow writes do not lower the effective rate
+                    delay = started + idx / rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                self._send_chunk(chunk({"content": token}))
+            usage = {
+                "prompt_tokens": 0,
+                "completion_tokens": len(tokens),
+                "total_tokens": len(tokens),
+            }
+            self._send_chunk(chunk({}, "stop", usage))
+            self._send_chunk(b"data: [DONE]\n\n")
+            # End of the chunked body
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+            fake.count("completed")
+            fake.count("tokens", len(tokens))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fake Azure AI Inference chat completions server for load tests"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--think-words", type=int, default=40)
+    parser.add_argument("--report-after", type=int, default=3)
+    args = parser.parse_args()
+
+    server = FakeInferenceServer(
+        host=args.host,
+        port=args.port,
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        think_words=args.think_words,
+        report_after=args.report_after,
+    )
+    print(f"Fake inference server listening on {server.url}")
+    print(f"  AZURE_DEEPSEEK_ENDPOINT={server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,417 @@
+# jobqueue.py
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+import dotenv
+
+from agent.jobs import JOB_OPTIONS, default_agent_factory
+from agent.tracing import ChromeTraceExporter, set_tracer
+from agent.visualization import ResearchPathVisualizer
+
+STATUS_QUEUED = "queued"
+STATUS_LEASED = "leased"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    stop_reason TEXT,
+    error TEXT,
+    output_dir TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+
+def job_key(question: str, options: Dict) -> str:
+    """Idempotency key of a job: the same question and options give the same id."""
+    payload = json.dumps({"question": question, "options": options}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+class SQLiteJobQueue:
+    """
+    File-backed research job queue shared by worker processes, on one machine
+    or on nodes sharing storage that supports SQLite locking.
+
+    Workers lease a job for lease_seconds and extend the lease with heartbeats.
+    A job whose lease expires (its worker died or hung) is handed to the next
+    worker that asks, up to max_attempts leases in total. Jobs are keyed by
+    their question and options, so enqueueing the same job twice is a no-op.
+
+    Args:
+        path: SQLite database file (created in WAL mode if missing)
+        lease_seconds: How long a lease lasts without a heartbeat
+        max_attempts: Leases per job before it is marked failed
+    """
+
+    def __init__(self, path: str, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection in autocommit mode; transactions are opened explicitly."""
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction holding the database lock from its first statement."""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def enqueue(self, question: str, options: Dict = None, job_id: str = None) -> str:
+        """Add a job unless a job with the same id exists; returns the job id."""
+        options = options or {}
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        job_id = job_id or job_key(question, options)
+        now = time.time()
+        with self._transaction() as db:
+            db.execute(
+                "INSERT OR IGNORE INTO jobs (id, question, options, status, created, "
+                "updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, question, json.dumps(options), STATUS_QUEUED, now, now),
+            )
+        return job_id
+
+    def lease(self, worker_id: str) -> Optional[Dict]:
+        """
+        Lease the oldest queued job, or a job whose lease has expired.
+
+        Returns:
+            The job as a dict (id, question, options, attempts), or None
+        """
+        now = time.time()
+        with self._transaction() as db:
+            # Expired leases that used up their attempts will not be retried
+            db.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_owner = NULL, "
+                "updated = ? WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (
+                    STATUS_FAILED,
+                    "Lease expired on the last attempt",
+                    now,
+                    STATUS_LEASED,
+                    now,
+                    self.max_attempts,
+                ),
+            )
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = ? "
+                "OR (status = ? AND lease_expires < ?) ORDER BY created LIMIT 1",
+                (STATUS_QUEUED, STATUS_LEASED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = ?, lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated = ? WHERE id = ?",
+                (STATUS_LEASED, worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+        return {
+            "id": row["id"],
+            "question": row["question"],
+            "options": json.loads(row["options"]),
+            "attempts": row["attempts"] + 1,
+        }
+
+    def heartbeat(self, job_id: str, worker_id: str) -> bool:
+        """Extend a lease. False means the worker no longer holds it."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (now + self.lease_seconds, now, job_id, STATUS_LEASED, worker_id),
+            )
+        return cursor.rowcount == 1
+
+    def complete(
+        self, job_id: str, worker_id: str, stop_reason: str, output_dir: str
+    ) -> bool:
+        """Mark a leased job done. False if the lease was lost in the meantime."""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = ?, stop_reason = ?, output_dir = ?, "
+                "error = NULL, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (
+                    STATUS_DONE,
+                    stop_reason,
+                    output_dir,
+                    now,
+                    job_id,
+                    STATUS_LEASED,
+                    worker_id,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Give a leased job back after an error: it is queued again while it has
+        attempts left, and marked failed otherwise.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < ? THEN ? ELSE ? END, "
+                "error = ?, lease_owner = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (
+                    self.max_attempts,
+                    STATUS_QUEUED,
+                    STATUS_FAILED,
+                    error,
+                    now,
+                    job_id,
+                    STATUS_LEASED,
+                    worker_id,
+                ),
+            )
+        return cursor.rowcount == 1
+
+    def jobs(self) -> List[Dict]:
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT id, question, status, attempts, lease_owner, stop_reason, "
+                "error, output_dir FROM jobs ORDER BY created"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as db:
+            counts = dict(
+                db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            )
+        return {
+            status: counts.get(status, 0)
+            for status in (STATUS_QUEUED, STATUS_LEASED, STATUS_DONE, STATUS_FAILED)
+        }
+
+
+def _write_atomic(path: Path, text: str):
+    """Write via a temporary file so re-runs of a job never leave partial output."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class _Heartbeat:
+    """Extends a lease in the background until stopped or the lease is lost."""
+
+    def __init__(self, queue: SQLiteJobQueue, job_id: str, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        interval = max(0.05, self.queue.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id):
+                    self.lost = True
+                    return
+            except sqlite3.Error:
+                # Try again with the next beat; the lease is still valid for a while
+                continue
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_job(job: Dict, output_dir: Path, agent_factory: Callable) -> str:
+    """
+    Research one job and write report.md, research_path.json and trace.json to
+    output_dir/<job id>/. Returns the stop reason.
+    """
+    tracer = ChromeTraceExporter()
+    previous = set_tracer(tracer)
+    try:
+        agent = agent_factory(job["options"], None)
+        report = agent.start(job["question"])
+    finally:
+        set_tracer(previous)
+
+    job_dir = output_dir / job["id"]
+    job_dir.mkdir(parents=True, exist_ok=True)
+    _write_atomic(job_dir / "report.md", report)
+    _write_atomic(
+        job_dir / "research_path.json",
+        ResearchPathVisualizer(agent.research_path).to_json(),
+    )
+    _write_atomic(
+        job_dir / "trace.json",
+        json.dumps({"traceEvents": tracer.events(), "displayTimeUnit": "ms"}),
+    )
+    return agent.stop_reason
+
+
+def run_worker(
+    queue: SQLiteJobQueue,
+    output_dir: str,
+    worker_id: str = None,
+    agent_factory: Callable = default_agent_factory,
+    poll_seconds: float = 2.0,
+    exit_when_empty: bool = False,
+) -> int:
+    """
+    Lease and research jobs until interrupted (or until the queue has nothing
+    left to lease, with exit_when_empty). Returns the number of jobs completed.
+    """
+    worker_id = worker_id or default_worker_id()
+    output_dir = Path(output_dir)
+    completed = 0
+    while True:
+        job = queue.lease(worker_id)
+        if job is None:
+            if exit_when_empty:
+                return completed
+            time.sleep(poll_seconds)
+            continue
+
+        print(
+            f"[{worker_id}] job {job['id']} (attempt {job['attempts']}): "
+            f"{job['question'][:60]}"
+        )
+        with _Heartbeat(queue, job["id"], worker_id) as heartbeat:
+            try:
+                stop_reason = run_job(job, output_dir, agent_factory)
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+
+        if heartbeat.lost:
+            # Another worker owns the job now; its results replace ours
+            print(f"[{worker_id}] lost the lease of job {job['id']}")
+        elif error is not None:
+            queue.fail(job["id"], worker_id, error)
+            print(f"[{worker_id}] job {job['id']} failed: {error}")
+        elif queue.complete(
+            job["id"], worker_id, stop_reason, str(output_dir / job["id"])
+        ):
+            completed += 1
+            print(f"[{worker_id}] job {job['id']} done ({stop_reason})")
+
+
+def main():
+    dotenv.load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Shared SQLite research job queue and its workers"
+    )
+    parser.add_argument("--db", default="output/jobs.sqlite3")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enqueue = subparsers.add_parser("enqueue", help="Add questions to the queue")
+    enqueue.add_argument("questions", nargs="*", help="Questions to research")
+    enqueue.add_argument("--file", default=None, help="File with one question per line")
+    enqueue.add_argument(
+        "--options", default="{}", help="JSON job options (as for the service)"
+    )
+
+    worker = subparsers.add_parser("worker", help="Research queued jobs")
+    worker.add_argument("--output", default="output/jobs")
+    worker.add_argument("--worker-id", default=None)
+    worker.add_argument("--lease-seconds", type=float, default=300.0)
+    worker.add_argument("--max-attempts", type=int, default=3)
+    worker.add_argument("--poll-seconds", type=float, default=2.0)
+    worker.add_argument(
+        "--corpus-dir", default=None, help='Document directory for tool="local" jobs'
+    )
+    worker.add_argument(
+        "--exit-when-empty",
+        action="store_true",
+        help="Stop once no job is left to lease instead of polling",
+    )
+
+    subparsers.add_parser("status", help="Show job counts and jobs")
+    args = parser.parse_args()
+
+    if args.command == "worker":
+        queue = SQLiteJobQueue(args.db, args.lease_seconds, args.max_attempts)
+        completed = run_worker(
+            queue,
+            args.output,
+            worker_id=args.worker_id,
+            agent_factory=functools.partial(
+                default_agent_factory, corpus_dir=args.corpus_dir
+            ),
+            poll_seconds=args.poll_seconds,
+            exit_when_empty=args.exit_when_empty,
+        )
+        print(f"Completed {completed} jobs")
+        return
+
+    queue = SQLiteJobQueue(args.db)
+    if args.command == "enqueue":
+        questions = list(args.questions)
+        if args.file:
+            with open(args.file, encoding="utf-8") as f:
+                questions += [line.strip() for line in f if line.strip()]
+        options = json.loads(args.options)
+        for question in questions:
+            print(f"{queue.enqueue(question, options)}  {question}")
+    else:
+        print(json.dumps(queue.stats()))
+        for job in queue.jobs():
+            print(
+                f"{job['id']}  {job['status']:<7} attempts={job['attempts']}  "
+                f"{job['question'][:60]}"
+            )
+
+
+if __name__ == "__main__":
+    main()
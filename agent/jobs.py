@@ -0,0 +1,53 @@
+# jobs.py
+
+import os
+from typing import Dict
+
+from agent.agent import ResearchAgent
+from agent.budget import ResearchBudget
+from agent.routing import ModelRouting
+from agent.scheduler import ResearchScheduler
+
+# Job options a client may set when submitting a job. The corpus directory of
+# tool="local" is a server setting (--corpus-dir), not a job option.
+JOB_OPTIONS = (
+    "tool",
+    "result_token_budget",
+    "priority",
+    "budget",
+    "routing",
+    "summarize_results",
+    "think_budget",
+    "think_budget_action",
+    "dedup_results",
+    "loop_detection",
+    "stall_timeout",
+    "request_timeout",
+)
+
+
+def default_agent_factory(
+    options: Dict, scheduler: ResearchScheduler = None, corpus_dir: str = None
+):
+    """
+    Build a ResearchAgent for a job from its (validated) options.
+
+    Args:
+        options: Job options (see JOB_OPTIONS)
+        scheduler: Optional ResearchScheduler shared by all agents
+        corpus_dir: Document directory searched by tool="local" jobs
+    """
+    options = dict(options)
+    budget = options.pop("budget", None)
+    routing = options.pop("routing", None)
+    return ResearchAgent(
+        neo4j_uri=os.getenv("NEO4J_URI"),
+        neo4j_username=os.getenv("NEO4J_USERNAME"),
+        neo4j_password=os.getenv("NEO4J_PASSWORD"),
+        verbose=False,
+        budget=ResearchBudget(**budget) if budget else None,
+        routing=ModelRouting.from_dict(routing) if routing else None,
+        scheduler=scheduler,
+        corpus_dir=corpus_dir,
+        **options,
+    )
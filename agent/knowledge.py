@@ -0,0 +1,261 @@
+# knowledge.py
+
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Set
+
+from agent.local_search import bm25_idf, bm25_term_score
+from agent.utils import CITATION_RE, tokenize
+
+KIND_REPORT = "report"
+KIND_FINDING = "finding"
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9*\"'])")
+LIST_MARKER_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+WORD_RE = re.compile(r"[A-Za-z0-9][\w-]*")
+
+SECONDS_PER_DAY = 86400.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS findings (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    created REAL NOT NULL,
+    verified REAL NOT NULL,
+    UNIQUE (kind, text)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    finding_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, finding_id)
+) WITHOUT ROWID;
+"""
+# Version 1: postings hold the terms of the finding text only (no topic terms)
+SCHEMA_VERSION = 1
+
+
+def query_entities(query: str) -> Set[str]:
+    """
+    Terms of the names in a question: capitalized words that do not start a
+    sentence, and acronyms such as "DOGEX" anywhere.
+    """
+    entities = set()
+    for sentence in re.split(r"(?<=[.!?])\s+", query.strip()):
+        for position, word in enumerate(WORD_RE.findall(sentence)):
+            acronym = sum(c.isupper() for c in word) >= 2
+            if len(word) < 2:
+                continue
+            if acronym or (position > 0 and word[0].isupper()):
+                entities.update(tokenize(word))
+    return entities
+
+
+def extract_findings(report: str, min_chars: int = 30) -> List[str]:
+    """
+    Split a final report into verified findings: the sentences and list items
+    that carry an inline citation with a year.
+    """
+    text = report.replace("<report>", "").replace("</report>", "")
+    findings = []
+    for line in text.splitlines():
+        line = LIST_MARKER_RE.sub("", line).strip()
+        for sentence in SENTENCE_RE.split(line):
+            sentence = sentence.strip().strip("*").strip()
+            if len(sentence) >= min_chars and CITATION_RE.search(sentence):
+                findings.append(sentence)
+    return list(dict.fromkeys(findings))
+
+
+def format_age(age_days: float) -> str:
+    if age_days < 1:
+        return "today"
+    days = int(age_days)
+    return f"{days} day{'s' if days != 1 else ''} old"
+
+
+class KnowledgeStore:
+    """
+    Persistent SQLite store of final reports and the cited findings in them,
+    searchable with BM25 over their terms. The topic (question) an entry was
+    researched for is kept with it but not indexed, so a finding only matches
+    questions about what it says.
+
+    A finding that shows up again in a later report is not duplicated; its
+    verification time is refreshed instead, so it becomes fresh again.
+
+    Args:
+        path: SQLite database file (created if missing)
+        fresh_days: Findings verified at most this many days ago count as
+            fresh; older ones are flagged for re-verification
+    """
+
+    def __init__(self, path: str = "output/knowledge.sqlite3", fresh_days: float = 7.0):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fresh_days = fresh_days
+        self._lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+            if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._reindex(db)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """A connection that commits on success and is always closed."""
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _reindex(self, db: sqlite3.Connection):
+        """Rebuild the postings of stores that also indexed the topic terms."""
+        db.execute("DELETE FROM postings")
+        for finding_id, text in db.execute("SELECT id, text FROM findings").fetchall():
+            terms = Counter(tokenize(text))
+            db.execute(
+                "UPDATE findings SET length = ? WHERE id = ?",
+                (sum(terms.values()), finding_id),
+            )
+            db.executemany(
+                "INSERT INTO postings (term, finding_id, tf) VALUES (?, ?, ?)",
+                [(term, finding_id, tf) for term, tf in terms.items()],
+            )
+
+    def _add(
+        self, db: sqlite3.Connection, kind: str, topic: str, text: str, now: float
+    ):
+        row = db.execute(
+            "SELECT id FROM findings WHERE kind = ? AND text = ?", (kind, text)
+        ).fetchone()
+        if row:
+            db.execute("UPDATE findings SET verified = ? WHERE id = ?", (now, row[0]))
+            return
+        terms = Counter(tokenize(text))
+        cursor = db.execute(
+            "INSERT INTO findings (kind, topic, text, length, created, verified) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (kind, topic, text, sum(terms.values()), now, now),
+        )
+        db.executemany(
+            "INSERT INTO postings (term, finding_id, tf) VALUES (?, ?, ?)",
+            [(term, cursor.lastrowid, tf) for term, tf in terms.items()],
+        )
+
+    def add_report(self, topic: str, report: str, now: float = None) -> int:
+        """
+        Store a final report and its cited findings under topic.
+
+        Returns:
+            The number of findings extracted from the report
+        """
+        now = time.time() if now is None else now
+        findings = extract_findings(report)
+        with self._lock, self._connect() as db:
+            self._add(db, KIND_REPORT, topic, report.strip(), now)
+            for finding in findings:
+                self._add(db, KIND_FINDING, topic, finding, now)
+        return len(findings)
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 8,
+        kind: str = KIND_FINDING,
+        now: float = None,
+        min_relative_score: float = 0.3,
+    ) -> List[Dict]:
+        """
+        Best matching entries of one kind, each as a dict with id, topic, text,
+        age_days and fresh.
+
+        When the query names entities (see query_entities()), only entries that
+        mention at least one of them are relevant; entries scoring below
+        min_relative_score times the best score are dropped as well.
+        """
+        now = time.time() if now is None else now
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        entities = query_entities(query) & terms
+
+        with self._connect() as db:
+            doc_count, avg_length = db.execute(
+                "SELECT COUNT(*), AVG(length) FROM findings WHERE kind = ?", (kind,)
+            ).fetchone()
+            if not doc_count:
+                return []
+
+            scores = Counter()
+            mentions = set()
+            for term in terms:
+                rows = db.execute(
+                    "SELECT p.finding_id, p.tf, f.length FROM postings p "
+                    "JOIN findings f ON f.id = p.finding_id "
+                    "WHERE p.term = ? AND f.kind = ?",
+                    (term, kind),
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = bm25_idf(doc_count, len(rows))
+                for finding_id, tf, length in rows:
+                    scores[finding_id] += bm25_term_score(tf, length, avg_length, idf)
+                    if term in entities:
+                        mentions.add(finding_id)
+
+            if entities:
+                scores = Counter({i: s for i, s in scores.items() if i in mentions})
+            if not scores:
+                return []
+            threshold = min_relative_score * max(scores.values())
+
+            results = []
+            for finding_id, score in scores.most_common(top_k):
+                if score < threshold:
+                    break
+                topic, text, verified = db.execute(
+                    "SELECT topic, text, verified FROM findings WHERE id = ?",
+                    (finding_id,),
+                ).fetchone()
+                age_days = max(0.0, now - verified) / SECONDS_PER_DAY
+                results.append(
+                    {
+                        "id": finding_id,
+                        "topic": topic,
+                        "text": text,
+                        "score": round(score, 4),
+                        "age_days": round(age_days, 2),
+                        "fresh": age_days <= self.fresh_days,
+                    }
+                )
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as db:
+            counts = dict(
+                db.execute("SELECT kind, COUNT(*) FROM findings GROUP BY kind")
+            )
+        return {
+            "reports": counts.get(KIND_REPORT, 0),
+            "findings": counts.get(KIND_FINDING, 0),
+        }
+
+
+def format_prior_findings(findings: List[Dict]) -> str:
+    """Render findings from KnowledgeStore.search() as a list for the prompt."""
+    return "\n".join(
+        f"- [{'FRESH' if finding['fresh'] else 'STALE'}, "
+        f"{format_age(finding['age_days'])}] {finding['text']}"
+        for finding in findings
+    )
@@ -0,0 +1,255 @@
+# loadtest.py
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from agent.agent import ResearchAgent
+from agent.events import StepMetrics, Stopped
+from agent.fake_inference import FakeInferenceServer
+from agent.scheduler import percentile
+from agent.singleflight import tool_calls
+
+DEFAULT_QUESTION = "Is Solana a good investment?"
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process; the peak RSS where /proc is missing, and
+    0 where neither is available (e.g. on Windows).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return 0
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _RssSampler:
+    """Samples the process RSS in a background thread and keeps the peak."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak = current_rss_bytes()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_bytes())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def fetch_server_stats(endpoint: str) -> Dict:
+    """Request counters of a fake inference endpoint ({} for real endpoints)."""
+    try:
+        with urllib.request.urlopen(f"{endpoint.rstrip('/')}/stats", timeout=5) as r:
+            return json.load(r)
+    except Exception:
+        return {}
+
+
+def run_agent(question: str, agent_options: Dict) -> Dict:
+    """Run one agent to completion and collect its per-step measurements."""
+    started = time.monotonic()
+    record = {
+        "steps": [],
+        "ttft": [],
+        "llm_calls": 0,
+        "error": None,
+        "stop_reason": None,
+    }
+    try:
+        agent = ResearchAgent(verbose=False, **agent_options)
+        for event in agent.start_stream(question):
+            if isinstance(event, StepMetrics):
+                record["steps"].append(event.seconds)
+                record["llm_calls"] += 1
+                if event.ttft_seconds is not None:
+                    record["ttft"].append(event.ttft_seconds)
+                if agent.tool == "search" and event.tool_seconds:
+                    # The mocked search engine is an LLM call as well
+                    record["llm_calls"] += 1
+            elif isinstance(event, Stopped):
+                record["stop_reason"] = event.reason
+    except Exception as e:
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["seconds"] = time.monotonic() - started
+    return record
+
+
+def run_level(
+    concurrency: int, runs: int, question: str, agent_options: Dict, endpoint: str
+) -> Dict:
+    """Run `runs` agents with at most `concurrency` at a time and summarize them."""
+    server_before = fetch_server_stats(endpoint)
+    coalesced_before = tool_calls.stats()["coalesced"]
+    rss_before = current_rss_bytes()
+    started = time.monotonic()
+    with _RssSampler() as sampler:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            records = list(
+                executor.map(lambda _: run_agent(question, agent_options), range(runs))
+            )
+    wall = time.monotonic() - started
+    server_after = fetch_server_stats(endpoint)
+
+    steps = [seconds for record in records for seconds in record["steps"]]
+    ttfts = [seconds for record in records for seconds in record["ttft"]]
+    errors = [record["error"] for record in records if record["error"]]
+    run_seconds = [record["seconds"] for record in records]
+    llm_calls = sum(record["llm_calls"] for record in records)
+
+    level = {
+        "concurrency": concurrency,
+        "runs": runs,
+        "wall_seconds": round(wall, 3),
+        "runs_per_second": round(runs / wall, 3) if wall else 0.0,
+        "steps": len(steps),
+        "steps_per_second": round(len(steps) / wall, 3) if wall else 0.0,
+        "step_seconds_p50": round(percentile(steps, 50), 4),
+        "step_seconds_p99": round(percentile(steps, 99), 4),
+        "ttft_seconds_p50": round(percentile(ttfts, 50), 4),
+        "ttft_seconds_p99": round(percentile(ttfts, 99), 4),
+        "run_seconds_p50": round(percentile(run_seconds, 50), 3),
+        "run_seconds_p99": round(percentile(run_seconds, 99), 3),
+        "tool_calls_coalesced": tool_calls.stats()["coalesced"] - coalesced_before,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / runs, 4) if runs else 0.0,
+        "error_samples": sorted(set(errors))[:3],
+        "peak_rss_mb": round(sampler.peak / 2**20, 1),
+        "peak_rss_mb_per_agent": round(
+            max(0, sampler.peak - rss_before) / 2**20 / concurrency, 2
+        ),
+    }
+
+    if server_before and server_after:
+        requests = server_after["requests"] - server_before["requests"]
+        retries = max(0, requests - llm_calls)
+        level.update(
+            {
+                "server_requests": requests,
+                "server_rate_limited": server_after["rate_limited"]
+                - server_before["rate_limited"],
+                "server_errors": server_after["errors"] - server_before["errors"],
+                "retries": retries,
+                "retry_rate": round(retries / llm_calls, 4) if llm_calls else 0.0,
+            }
+        )
+    return level
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Ramp concurrent ResearchAgent runs and report latency percentiles"
+    )
+    parser.add_argument(
+        "--concurrency",
+        default="1,2,4,8",
+        help="Comma-separated concurrency levels to ramp through",
+    )
+    parser.add_argument(
+        "--runs-per-level",
+        type=int,
+        default=None,
+        help="Agent runs per level (default: the level's concurrency)",
+    )
+    parser.add_argument("--question", default=DEFAULT_QUESTION)
+    parser.add_argument(
+        "--tool", default="synthetic", choices=["search", "local", "synthetic"]
+    )
+    parser.add_argument("--corpus-dir", default=None)
+    parser.add_argument(
+        "--endpoint",
+        default=None,
+        help="Inference endpoint to use; by default a local fake server is started",
+    )
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--report-after", type=int, default=3)
+    parser.add_argument("--output", default="output/loadtest.json")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    agent_options = {"tool": args.tool}
+    if args.corpus_dir:
+        agent_options["corpus_dir"] = args.corpus_dir
+
+    fake = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        fake = FakeInferenceServer(
+            ttft=args.ttft,
+            tokens_per_second=args.tokens_per_second,
+            error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate,
+            report_after=args.report_after,
+        ).start()
+        endpoint = fake.url
+        os.environ.setdefault("AZURE_DEEPSEEK_API_KEY", "fake-key")
+    os.environ["AZURE_DEEPSEEK_ENDPOINT"] = endpoint
+
+    results: List[Dict] = []
+    try:
+        for concurrency in levels:
+            runs = args.runs_per_level or concurrency
+            level = run_level(concurrency, runs, args.question, agent_options, endpoint)
+            results.append(level)
+            print(
+                f"concurrency={concurrency:>4}  "
+                f"runs/s={level['runs_per_second']:>8}  "
+                f"step p50/p99={level['step_seconds_p50']}/"
+                f"{level['step_seconds_p99']}s  "
+                f"ttft p50/p99={level['ttft_seconds_p50']}/"
+                f"{level['ttft_seconds_p99']}s  "
+                f"errors={level['errors']}"
+            )
+    finally:
+        if fake is not None:
+            fake.stop()
+
+    report = {
+        "config": {
+            "question": args.question,
+            "tool": args.tool,
+            "endpoint": "fake" if fake is not None else endpoint,
+            "ttft": args.ttft if fake is not None else None,
+            "tokens_per_second": args.tokens_per_second if fake is not None else None,
+            "error_rate": args.error_rate if fake is not None else None,
+            "rate_limit_rate": args.rate_limit_rate if fake is not None else None,
+        },
+        "levels": results,
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Load test results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
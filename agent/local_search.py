@@ -0,0 +1,484 @@
+# local_search.py
+
+import json
+import math
+import mmap
+import os
+import re
+import threading
+from array import array
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of this process are serialized
+    fcntl = None
+
+from agent.results import ResultSet, SearchHit
+from agent.utils import tokenize
+
+SUPPORTED_SUFFIXES = (".md", ".markdown", ".txt", ".jsonl")
+INDEX_DIR_NAME = ".search_index"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = "index.lock"
+
+# BM25 parameters (the usual Robertson/Lucene defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def bm25_idf(doc_count: int, doc_freq: int) -> float:
+    """Non-negative BM25 inverse document frequency."""
+    return math.log(1.0 + (doc_count - doc_freq + 0.5) / (doc_freq + 0.5))
+
+
+def bm25_term_score(
+    term_freq: int, doc_length: int, avg_doc_length: float, idf: float
+) -> float:
+    """BM25 contribution of a single term occurring term_freq times in a document."""
+    norm = BM25_K1 * (1.0 - BM25_B + BM25_B * doc_length / (avg_doc_length or 1.0))
+    return idf * term_freq * (BM25_K1 + 1.0) / (term_freq + norm)
+
+
+def _chunk_paragraphs(text: str, chunk_words: int) -> Iterator[Tuple[str, str]]:
+    """
+    Split markdown/plain text into (title, passage) chunks.
+
+    Paragraphs are separated by blank lines and merged until a chunk holds
+    roughly chunk_words words. The title is the closest preceding markdown heading.
+    """
+    title = ""
+    buffer = []
+    buffer_words = 0
+
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if paragraph.startswith("#"):
+            heading, _, rest = paragraph.partition("\n")
+            if buffer:
+                yield title, "\n\n".join(buffer)
+                buffer, buffer_words = [], 0
+            title = heading.lstrip("#").strip()
+            paragraph = rest.strip()
+            if not paragraph:
+                continue
+
+        buffer.append(paragraph)
+        buffer_words += len(paragraph.split())
+        if buffer_words >= chunk_words:
+            yield title, "\n\n".join(buffer)
+            buffer, buffer_words = [], 0
+
+    if buffer:
+        yield title, "\n\n".join(buffer)
+
+
+def _read_documents(path: Path, source: str, chunk_words: int) -> Iterator[Dict]:
+    """Yield indexable documents ({"source", "title", "text"}) from one corpus file."""
+    if path.suffix == ".jsonl":
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, str):
+                    record = {"text": record}
+                text = record.get("text") or record.get("content") or record.get("body")
+                if not text:
+                    continue
+                yield {
+                    "source": record.get("url")
+                    or record.get("source")
+                    or f"{source}:{line_no}",
+                    "title": record.get("title", ""),
+                    "text": text,
+                }
+    else:
+        text = path.read_text(encoding="utf-8", errors="replace")
+        for title, passage in _chunk_paragraphs(text, chunk_words):
+            yield {"source": source, "title": title, "text": passage}
+
+
+class _Segment:
+    """
+    One immutable batch of indexed documents.
+
+    Postings are stored as a flat array of (doc_id, term_freq) uint32 pairs that
+    is memory-mapped, so only the postings lists touched by a query are paged in.
+    """
+
+    def __init__(self, index_dir: Path, name: str):
+        self.name = name
+        with open(index_dir / f"{name}.lexicon.json", encoding="utf-8") as f:
+            # term -> [offset in pairs, number of postings]
+            self.lexicon = json.load(f)
+
+        self.doc_offsets = {}  # doc_id -> (byte offset, length) in the docs file
+        self.doc_lengths = {}  # doc_id -> number of terms
+        self._docs_file = open(index_dir / f"{name}.docs.jsonl", "rb")
+        offset = 0
+        for line in self._docs_file:
+            doc = json.loads(line)
+            self.doc_offsets[doc["id"]] = (offset, len(line))
+            self.doc_lengths[doc["id"]] = doc["length"]
+            offset += len(line)
+
+        self._postings_file = open(index_dir / f"{name}.postings", "rb")
+        if os.fstat(self._postings_file.fileno()).st_size:
+            self._postings = mmap.mmap(
+                self._postings_file.fileno(), 0, access=mmap.ACCESS_READ
+            )
+            self._pairs = memoryview(self._postings).cast("I")
+        else:
+            self._postings = None
+            self._pairs = memoryview(b"").cast("I")
+
+    def postings(self, term: str) -> memoryview:
+        """Zero-copy view over the (doc_id, term_freq) pairs of a term."""
+        entry = self.lexicon.get(term)
+        if not entry:
+            return self._pairs[0:0]
+        offset, count = entry
+        return self._pairs[2 * offset : 2 * (offset + count)]
+
+    def document(self, doc_id: int) -> Dict:
+        offset, length = self.doc_offsets[doc_id]
+        self._docs_file.seek(offset)
+        return json.loads(self._docs_file.read(length))
+
+    def close(self):
+        self._pairs.release()
+        if self._postings is not None:
+            self._postings.close()
+        self._postings_file.close()
+        self._docs_file.close()
+
+    @staticmethod
+    def write(index_dir: Path, name: str, docs: List[Dict]):
+        """Build the postings, lexicon and docs files for a new segment."""
+        postings = defaultdict(list)
+        with open(index_dir / f"{name}.docs.jsonl", "w", encoding="utf-8") as f:
+            for doc in docs:
+                for term, freq in doc.pop("term_freqs").items():
+                    postings[term].append((doc["id"], freq))
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+
+        lexicon = {}
+        pairs = array("I")
+        for term in sorted(postings):
+            lexicon[term] = [len(pairs) // 2, len(postings[term])]
+            for doc_id, freq in postings[term]:
+                pairs.append(doc_id)
+                pairs.append(freq)
+
+        with open(index_dir / f"{name}.postings", "wb") as f:
+            pairs.tofile(f)
+        with open(index_dir / f"{name}.lexicon.json", "w", encoding="utf-8") as f:
+            json.dump(lexicon, f, ensure_ascii=False)
+
+
+_thread_locks: Dict[Path, threading.Lock] = {}
+_thread_locks_lock = threading.Lock()
+
+
+@contextmanager
+def _index_lock(index_dir: Path):
+    """Exclusive lock on an index directory, across threads and processes."""
+    with _thread_locks_lock:
+        thread_lock = _thread_locks.setdefault(index_dir.resolve(), threading.Lock())
+    with thread_lock, open(index_dir / LOCK_NAME, "a") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        # Closing the file releases the lock
+        yield
+
+
+class LocalSearchIndex:
+    """
+    Incremental BM25 inverted index over a directory of .md, .txt and .jsonl files.
+
+    Each call to update() indexes only new or modified files into a fresh segment
+    and tombstones documents from modified or deleted files. Segments are merged
+    by compact(), which also runs automatically once max_segments is exceeded.
+
+    Changes hold a lock file in the index directory, so several indexes (in
+    threads or processes) can share a directory; each reloads the manifest
+    written by the others before changing it.
+    """
+
+    def __init__(self, index_dir: str, chunk_words: int = 120, max_segments: int = 8):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.chunk_words = chunk_words
+        self.max_segments = max_segments
+        self.segments = []
+        with _index_lock(self.index_dir):
+            self._load()
+
+    def _read_manifest(self) -> Dict:
+        manifest_path = self.index_dir / MANIFEST_NAME
+        if manifest_path.exists():
+            with open(manifest_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {
+            "next_doc_id": 0,
+            "next_segment": 0,
+            "segments": [],
+            "files": {},
+            "deleted": [],
+        }
+
+    def _load(self, manifest: Dict = None):
+        """(Re)open the segments of the manifest on disk."""
+        self.close()
+        self.manifest = manifest or self._read_manifest()
+        self.deleted = set(self.manifest["deleted"])
+        self.segments = [
+            _Segment(self.index_dir, name) for name in self.manifest["segments"]
+        ]
+        self._refresh_stats()
+
+    def _reload_if_changed(self):
+        """Pick up changes another index made to the directory. Call locked."""
+        manifest = self._read_manifest()
+        if manifest != self.manifest:
+            self._load(manifest)
+
+    def _refresh_stats(self):
+        lengths = [
+            length
+            for segment in self.segments
+            for doc_id, length in segment.doc_lengths.items()
+            if doc_id not in self.deleted
+        ]
+        self.doc_count = len(lengths)
+        self.avg_doc_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    def _save_manifest(self):
+        self.manifest["deleted"] = sorted(self.deleted)
+        self.manifest["segments"] = [segment.name for segment in self.segments]
+        tmp_path = (
+            self.index_dir
+            / f"{MANIFEST_NAME}.{os.getpid()}.{threading.get_ident()}.tmp"
+        )
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.index_dir / MANIFEST_NAME)
+
+    def _add_segment(self, docs: List[Dict]):
+        name = f"seg{self.manifest['next_segment']:05d}"
+        self.manifest["next_segment"] += 1
+        _Segment.write(self.index_dir, name, docs)
+        self.segments.append(_Segment(self.index_dir, name))
+
+    def update(self, corpus_dir: str) -> Dict[str, int]:
+        """
+        Bring the index in line with corpus_dir, re-reading only changed files.
+
+        Returns:
+            Counts of "added", "updated", "removed" and "unchanged" files
+        """
+        with _index_lock(self.index_dir):
+            self._reload_if_changed()
+            return self._update(corpus_dir)
+
+    def _update(self, corpus_dir: str) -> Dict[str, int]:
+        corpus_dir = Path(corpus_dir)
+        index_dir = self.index_dir.resolve()
+        files = self.manifest["files"]
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        new_docs = []
+        seen = set()
+
+        for path in sorted(corpus_dir.rglob("*")):
+            if path.suffix not in SUPPORTED_SUFFIXES or not path.is_file():
+                continue
+            if index_dir in path.resolve().parents:
+                continue
+            source = path.relative_to(corpus_dir).as_posix()
+            seen.add(source)
+            stat = path.stat()
+            signature = [stat.st_mtime_ns, stat.st_size]
+
+            previous = files.get(source)
+            if previous and previous["signature"] == signature:
+                stats["unchanged"] += 1
+                continue
+            if previous:
+                self.deleted.update(previous["doc_ids"])
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+
+            doc_ids = []
+            for doc in _read_documents(path, source, self.chunk_words):
+                terms = tokenize(f"{doc['title']} {doc['text']}")
+                doc["id"] = self.manifest["next_doc_id"]
+                doc["length"] = len(terms)
+                doc["term_freqs"] = Counter(terms)
+                self.manifest["next_doc_id"] += 1
+                doc_ids.append(doc["id"])
+                new_docs.append(doc)
+            files[source] = {"signature": signature, "doc_ids": doc_ids}
+
+        for source in set(files) - seen:
+            self.deleted.update(files.pop(source)["doc_ids"])
+            stats["removed"] += 1
+
+        if new_docs:
+            self._add_segment(new_docs)
+        if len(self.segments) > self.max_segments:
+            self._compact()
+        else:
+            self._save_manifest()
+            self._refresh_stats()
+        return stats
+
+    def compact(self):
+        """Merge all segments into one, dropping tombstoned documents."""
+        with _index_lock(self.index_dir):
+            self._reload_if_changed()
+            self._compact()
+
+    def _compact(self):
+        docs = []
+        for segment in self.segments:
+            for doc_id in segment.doc_offsets:
+                if doc_id in self.deleted:
+                    continue
+                doc = segment.document(doc_id)
+                doc["term_freqs"] = Counter(tokenize(f"{doc['title']} {doc['text']}"))
+                docs.append(doc)
+
+        old_segments = self.segments
+        self.segments = []
+        self.deleted = set()
+        if docs:
+            self._add_segment(docs)
+        self._save_manifest()
+        self._refresh_stats()
+
+        for segment in old_segments:
+            segment.close()
+            for suffix in (".postings", ".lexicon.json", ".docs.jsonl"):
+                (self.index_dir / f"{segment.name}{suffix}").unlink(missing_ok=True)
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[float, Dict]]:
+        """
+        Rank live documents against the query with BM25.
+
+        Returns:
+            Up to top_k (score, document) pairs, best first
+        """
+        terms = set(tokenize(query))
+        scores = defaultdict(float)
+        owners = {}
+
+        for term in terms:
+            doc_freq = sum(
+                segment.lexicon.get(term, (0, 0))[1] for segment in self.segments
+            )
+            if not doc_freq:
+                continue
+            idf = bm25_idf(self.doc_count, doc_freq)
+            for segment in self.segments:
+                pairs = segment.postings(term)
+                for i in range(0, len(pairs), 2):
+                    doc_id = pairs[i]
+                    if doc_id in self.deleted:
+                        continue
+                    scores[doc_id] += bm25_term_score(
+                        pairs[i + 1],
+                        segment.doc_lengths[doc_id],
+                        self.avg_doc_length,
+                        idf,
+                    )
+                    owners[doc_id] = segment
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(score, owners[doc_id].document(doc_id)) for doc_id, score in ranked]
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
+
+
+class LocalSearchEngine:
+    """
+    Drop-in replacement for mock_search_engine backed by a LocalSearchIndex.
+
+    Calling the engine with a query returns the top_k passages as a ResultSet,
+    rendered in the same ```search N``` block format the mocked search engine
+    produces.
+    """
+
+    def __init__(
+        self,
+        corpus_dir: str,
+        index_dir: str = None,
+        top_k: int = 5,
+        auto_refresh: bool = False,
+    ):
+        self.corpus_dir = corpus_dir
+        self.top_k = top_k
+        self.auto_refresh = auto_refresh
+        self._lock = threading.Lock()
+        self.index = LocalSearchIndex(index_dir or Path(corpus_dir) / INDEX_DIR_NAME)
+        self.index.update(corpus_dir)
+
+    def refresh(self) -> Dict[str, int]:
+        """Incrementally re-index the corpus directory."""
+        with self._lock:
+            return self.index.update(self.corpus_dir)
+
+    def __call__(self, query: str) -> ResultSet:
+        if self.auto_refresh:
+            self.refresh()
+        with self._lock:
+            hits = self.index.search(query, top_k=self.top_k)
+        if not hits:
+            return ResultSet(query, message=f'No results found for "{query}".')
+
+        items = []
+        for score, doc in hits:
+            header = (
+                f"{doc['title']} ({doc['source']})" if doc["title"] else doc["source"]
+            )
+            items.append(SearchHit(doc["text"], header, score))
+        return ResultSet(query, items)
+
+
+_shared_engines: Dict[Path, LocalSearchEngine] = {}
+_shared_engines_lock = threading.Lock()
+
+
+def shared_local_engine(corpus_dir: str) -> LocalSearchEngine:
+    """
+    The process-wide LocalSearchEngine of a corpus directory. All agents
+    searching the same (resolved) directory share one engine and index, which
+    is built on first use and kept for the process lifetime.
+    """
+    key = Path(corpus_dir).resolve()
+    with _shared_engines_lock:
+        engine = _shared_engines.get(key)
+        if engine is None:
+            engine = _shared_engines[key] = LocalSearchEngine(str(key))
+    return engine
+
+
+def local_search_engine(query: str) -> ResultSet:
+    """
+    Searches the corpus directory named by the LOCAL_SEARCH_CORPUS environment
+    variable, through its shared engine.
+    """
+    return shared_local_engine(os.environ["LOCAL_SEARCH_CORPUS"])(query)
@@ -0,0 +1,122 @@
+# loops.py
+
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
+
+from agent.passages import PassageFingerprints, split_passages
+from agent.results import ResultSet
+from agent.utils import tokenize
+
+# Kinds of unproductive patterns
+LOOP_REPEATED_QUERY = "repeated_query"
+LOOP_QUERY_CYCLE = "query_cycle"
+LOOP_STALL = "no_new_information"
+
+# How the agent reacts to a detected pattern
+ACTION_CORRECT = "corrected"
+ACTION_FORCE_REPORT = "forced_report"
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    # Queries without terms (only stopwords or punctuation) match nothing
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class LoopDetector:
+    """
+    Watches one research run for queries that repeat earlier ones (immediately,
+    or as a cycle over several steps) and for streaks of tool results without
+    new passages.
+
+    The first max_corrections detections ask for a correction; after that the
+    agent is told to write its report.
+
+    Args:
+        query_similarity: Jaccard similarity of query terms from which two
+            queries count as the same
+        min_new_ratio: Results with a smaller share of unseen passages add no
+            new information
+        stall_steps: Consecutive steps without new information that count as a
+            stall
+        max_corrections: Detections answered with a corrective message before
+            the report is forced
+    """
+
+    def __init__(
+        self,
+        query_similarity: float = 0.8,
+        min_new_ratio: float = 0.2,
+        stall_steps: int = 2,
+        max_corrections: int = 1,
+    ):
+        self.query_similarity = query_similarity
+        self.min_new_ratio = min_new_ratio
+        self.stall_steps = stall_steps
+        self.max_corrections = max_corrections
+        self.events: List[Dict] = []
+        self._queries: List[Tuple[int, FrozenSet[str]]] = []
+        self._fingerprints = PassageFingerprints()
+        self._stalled_steps = 0
+
+    def _event(self, kind: str, step: int, detail: str) -> Dict:
+        corrections = sum(1 for e in self.events if e["action"] == ACTION_CORRECT)
+        if corrections < self.max_corrections:
+            action = ACTION_CORRECT
+        else:
+            action = ACTION_FORCE_REPORT
+        event = {"kind": kind, "step": step, "detail": detail, "action": action}
+        self.events.append(event)
+        return event
+
+    def observe_query(self, query: str, step: int) -> Optional[Dict]:
+        """Record the query of a step; returns an event if it repeats an earlier one."""
+        terms = frozenset(tokenize(query))
+        match = cycle_length = None
+        for distance, (previous_step, previous_terms) in enumerate(
+            reversed(self._queries), 1
+        ):
+            if jaccard(terms, previous_terms) >= self.query_similarity:
+                match, cycle_length = previous_step, distance
+                break
+        self._queries.append((step, terms))
+        if match is None:
+            return None
+
+        if cycle_length == 1:
+            return self._event(
+                LOOP_REPEATED_QUERY,
+                step,
+                f"the query repeats the query of step {match}",
+            )
+        return self._event(
+            LOOP_QUERY_CYCLE,
+            step,
+            f"the query returns to the query of step {match}, "
+            f"cycling over the last {cycle_length} queries",
+        )
+
+    def observe_results(
+        self, results: Union[str, ResultSet], step: int
+    ) -> Optional[Dict]:
+        """Record a tool result; returns an event once new information stalls."""
+        passages = split_passages(results)
+        new = 0
+        for passage in passages:
+            if not self._fingerprints.lookup(passage["text"]):
+                new += 1
+                self._fingerprints.add(passage["text"], str(step))
+        ratio = new / len(passages) if passages else 0.0
+
+        if ratio >= self.min_new_ratio:
+            self._stalled_steps = 0
+            return None
+        self._stalled_steps += 1
+        if self._stalled_steps < self.stall_steps:
+            return None
+        self._stalled_steps = 0
+        return self._event(
+            LOOP_STALL,
+            step,
+            f"the last {self.stall_steps} searches returned almost nothing new",
+        )
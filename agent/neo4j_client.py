@@ -2,10 +2,16 @@ from typing import Any, Dict, List
 
 from neo4j import GraphDatabase
 
+from agent.results import RESULT_GRAPH, GraphRow, ResultSet
+from agent.singleflight import tool_calls
+from agent.tracing import span
+
 
 class Neo4jClient:
     def __init__(self, uri: str, username: str, password: str):
         """Initialize Neo4j client with connection details."""
+        self.uri = uri
+        self.username = username
         self.driver = GraphDatabase.driver(uri, auth=(username, password))
 
     def close(self):
@@ -14,7 +20,8 @@ class Neo4jClient:
 
     def execute_query(self, cypher_query: str) -> List[Dict[str, Any]]:
         """
-        Execute a Cypher query and return the results.
+        Execute a Cypher query and return the results. Concurrent identical
+        queries against the same database (from any client) share one execution.
 
         Args:
             cypher_query: The Cypher query to execute
@@ -22,11 +29,20 @@ class Neo4jClient:
         Returns:
             List of dictionaries containing the query results
         """
+        key = ("neo4j", self.uri, self.username, cypher_query.strip())
+        with span("neo4j.execute_query"):
+            rows = tool_calls.do(key, self._run_query, cypher_query)
+        # Coalesced callers get their own copies of the shared rows
+        return [dict(row) for row in rows]
+
+    def _run_query(self, cypher_query: str) -> List[Dict[str, Any]]:
         with self.driver.session() as session:
-            result = session.run(cypher_query)
-            return [dict(record) for record in result]
+            with span("neo4j.transaction"):
+                records = list(session.run(cypher_query))
+        with span("neo4j.format_results", records=len(records)):
+            return [dict(record) for record in records]
 
-    def mock_query(self, cypher_query: str) -> str:
+    def mock_query(self, cypher_query: str) -> ResultSet:
         """
         For development/testing - returns mock results for a Cypher query.
 
@@ -34,24 +50,31 @@ class Neo4jClient:
             cypher_query: The Cypher query that would be executed
 
         Returns:
-            A string containing mock results formatted for the agent
+            A ResultSet of mock rows, rendered as a ```result``` block for the agent
         """
-        # This is a simple mock that returns formatted results
+        with span("neo4j.mock_query"):
+            return self._mock_results(cypher_query)
+
+    @staticmethod
+    def _mock_results(cypher_query: str) -> ResultSet:
+        # This is a simple mock that returns fixed rows
         # In a real implementation, this would parse the query and generate relevant mock data
-        return f"""```result
-Query: {cypher_query}
-
-Mock Results:
-[Node1] -> relationship -> [Node2]
-  Properties: {{
-    "name": "Example",
-    "timestamp": "2024-02-24",
-    "source": "trusted_source"
-  }}
-
-[Node2] -> another_relationship -> [Node3]
-  Properties: {{
-    "description": "Related information",
-    "confidence": 0.95
-  }}
-```"""
+        rows = [
+            GraphRow(
+                "Node1",
+                "relationship",
+                "Node2",
+                {
+                    "name": "Example",
+                    "timestamp": "2024-02-24",
+                    "source": "trusted_source",
+                },
+            ),
+            GraphRow(
+                "Node2",
+                "another_relationship",
+                "Node3",
+                {"description": "Related information", "confidence": 0.95},
+            ),
+        ]
+        return ResultSet(cypher_query, rows, kind=RESULT_GRAPH)
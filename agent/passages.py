@@ -0,0 +1,308 @@
+# passages.py
+
+import re
+from collections import Counter
+from typing import Dict, List, Tuple, Union
+
+from agent.local_search import bm25_idf, bm25_term_score
+from agent.results import FENCED_BLOCK_RE, RESULT_GRAPH, ResultSet
+from agent.utils import estimate_tokens, tokenize
+
+# Weight of the original question relative to the current query when scoring
+QUESTION_WEIGHT = 0.5
+
+
+def _split_long(paragraph: str, max_words: int) -> List[str]:
+    """Split a paragraph into sentence windows of at most ~max_words words."""
+    if len(paragraph.split()) <= max_words:
+        return [paragraph]
+
+    windows, current, current_words = [], [], 0
+    for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+        words = len(sentence.split())
+        if current and current_words + words > max_words:
+            windows.append(" ".join(current))
+            current, current_words = [], 0
+        current.append(sentence)
+        current_words += words
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+
+def _split_block(body: str) -> Tuple[str, List[str]]:
+    """
+    The header line and paragraphs of a block body. A leading "Source: ..." line
+    (of a search result) or "Query: ..." line (of a graph result) is the header.
+    """
+    header = ""
+    body = body.strip()
+    if body.startswith(("Source:", "Query:")):
+        header, _, body = body.partition("\n")
+    return header, [p.strip() for p in re.split(r"\n\s*\n", body) if p.strip()]
+
+
+def _join_header(header: str, body: str) -> str:
+    """Put a block header back in front of its body, as _split_block found it."""
+    if not header:
+        return body
+    # Graph results leave a blank line after their query
+    separator = "\n\n" if header.startswith("Query:") else "\n"
+    return f"{header}{separator}{body}"
+
+
+def _blocks(results: Union[str, ResultSet]) -> List[Tuple[str, str, List[str]]]:
+    """
+    (label, header, paragraphs) of every fenced block. A ResultSet provides its
+    fields directly: the paragraphs of a graph result are its rows.
+    """
+    if isinstance(results, ResultSet) and results.kind == RESULT_GRAPH:
+        rows = [row.render() for row in results.items]
+        if not rows and results.message.strip():
+            rows = [results.message.strip()]
+        return [("result", f"Query: {results.query}", rows)]
+    if isinstance(results, ResultSet):
+        blocks = results.blocks()
+    else:
+        blocks = [
+            (match.group(1).strip(), match.group(2))
+            for match in FENCED_BLOCK_RE.finditer(results)
+        ] or [("", results)]
+    return [(label, *_split_block(body)) for label, body in blocks]
+
+
+def split_passages(results: Union[str, ResultSet], max_words: int = 80) -> List[Dict]:
+    """
+    Split tool output into passages.
+
+    Every fenced block (```search N```, ```result```) is split on blank lines and
+    long paragraphs into sentence windows. A leading "Source: ..." or "Query: ..."
+    line is kept as the block header instead of becoming a passage. Text outside
+    any fence forms a block with an empty label. A ResultSet provides its blocks
+    directly, so its text is not parsed; each row of a graph result is a passage.
+
+    Returns:
+        A list of {"block", "block_id", "header", "position", "text"} dicts in
+        document order
+    """
+    passages = []
+    for block_id, (label, header, paragraphs) in enumerate(_blocks(results)):
+        for paragraph in paragraphs:
+            for text in _split_long(paragraph, max_words):
+                passages.append(
+                    {
+                        "block": label,
+                        "block_id": block_id,
+                        "header": header,
+                        "position": len(passages),
+                        "text": text,
+                    }
+                )
+    return passages
+
+
+def score_passages(passages: List[Dict], query: str, question: str = "") -> List[float]:
+    """
+    BM25 scores of each passage, treating the passages as the collection.
+
+    Terms of the current query count fully, terms of the original question with
+    QUESTION_WEIGHT, so passages relevant to the overall goal are not discarded.
+    """
+    weights = Counter()
+    for term in set(tokenize(query)):
+        weights[term] += 1.0
+    for term in set(tokenize(question)):
+        weights[term] += QUESTION_WEIGHT
+
+    term_freqs = [Counter(tokenize(passage["text"])) for passage in passages]
+    lengths = [sum(freqs.values()) for freqs in term_freqs]
+    avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+    doc_freqs = Counter(term for freqs in term_freqs for term in freqs)
+
+    scores = []
+    for freqs, length in zip(term_freqs, lengths):
+        score = 0.0
+        for term, weight in weights.items():
+            if term in freqs:
+                idf = bm25_idf(len(passages), doc_freqs[term])
+                score += weight * bm25_term_score(freqs[term], length, avg_length, idf)
+        scores.append(score)
+    return scores
+
+
+def pack_passages(
+    results: Union[str, ResultSet],
+    query: str,
+    question: str = "",
+    token_budget: int = 1000,
+) -> Union[str, ResultSet]:
+    """
+    Keep only the most relevant passages of a tool result within token_budget.
+
+    Passages are ranked by score_passages and added greedily while they fit. The
+    kept passages are re-rendered in their original order and fenced blocks, so
+    the model still sees e.g. ```search 2``` with its source header. Results
+    that fit are returned as they are.
+    """
+    passages = split_passages(results)
+    if not passages or estimate_tokens(str(results)) <= token_budget:
+        return results
+
+    scores = score_passages(passages, query, question)
+    ranked = sorted(passages, key=lambda p: (-scores[p["position"]], p["position"]))
+
+    kept, used = [], 0
+    for passage in ranked:
+        cost = estimate_tokens(passage["text"])
+        if used + cost > token_budget:
+            continue
+        kept.append(passage)
+        used += cost
+    if not kept:
+        # Even the best passage is over budget; keep a truncated prefix of it
+        best = dict(ranked[0])
+        best["text"] = best["text"][: token_budget * 4].rstrip() + "..."
+        kept.append(best)
+
+    kept.sort(key=lambda p: p["position"])
+    rendered, current_block, current_lines = [], None, []
+
+    def flush():
+        if current_block is None:
+            return
+        _, label, header = current_block
+        body = _join_header(header, "\n\n".join(current_lines))
+        rendered.append(f"```{label}\n{body}\n```" if label else body)
+
+    for passage in kept:
+        block = (passage["block_id"], passage["block"], passage["header"])
+        if block != current_block:
+            flush()
+            current_block, current_lines = block, []
+        current_lines.append(passage["text"])
+    flush()
+
+    rendered.append(f"({len(kept)} of {len(passages)} passages kept)")
+    return "\n".join(rendered)
+
+
+class PassageFingerprints:
+    """
+    Run-level index of passages already shown to the model.
+
+    Passages are matched exactly on their normalized terms, and approximately on
+    word shingles: a passage whose shingle set has a Jaccard similarity of at
+    least threshold with an earlier one counts as a duplicate of it.
+
+    Args:
+        shingle_size: Words per shingle
+        threshold: Minimum Jaccard similarity of near-duplicates
+    """
+
+    def __init__(self, shingle_size: int = 4, threshold: float = 0.8):
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self._exact: Dict[str, str] = {}
+        self._shingle_sets: List[frozenset] = []
+        self._refs: List[str] = []
+        self._postings: Dict[int, List[int]] = {}
+
+    def _shingles(self, terms: List[str]) -> frozenset:
+        size = self.shingle_size
+        return frozenset(
+            hash(tuple(terms[i : i + size])) for i in range(len(terms) - size + 1)
+        )
+
+    def lookup(self, text: str) -> str:
+        """Reference of an earlier passage matching text, or "" if it is new."""
+        terms = tokenize(text)
+        if not terms:
+            return ""
+        ref = self._exact.get(" ".join(terms))
+        if ref or len(terms) < self.shingle_size:
+            return ref or ""
+
+        shingles = self._shingles(terms)
+        overlaps = Counter(
+            idx for shingle in shingles for idx in self._postings.get(shingle, ())
+        )
+        best_ref, best_similarity = "", 0.0
+        for idx, shared in overlaps.items():
+            union = len(shingles) + len(self._shingle_sets[idx]) - shared
+            similarity = shared / union
+            if similarity >= self.threshold and similarity > best_similarity:
+                best_ref, best_similarity = self._refs[idx], similarity
+        return best_ref
+
+    def add(self, text: str, ref: str):
+        terms = tokenize(text)
+        if not terms:
+            return
+        self._exact.setdefault(" ".join(terms), ref)
+        if len(terms) < self.shingle_size:
+            return
+        idx = len(self._refs)
+        shingles = self._shingles(terms)
+        self._shingle_sets.append(shingles)
+        self._refs.append(ref)
+        for shingle in shingles:
+            self._postings.setdefault(shingle, []).append(idx)
+
+
+def _block_ref(label: str, step: int, paragraph: int, paragraphs: int) -> str:
+    """Human-readable reference such as "step 3 result 2" or "step 4 row 1"."""
+    kind, _, number = label.partition(" ")
+    if kind == "search" and number:
+        ref = f"step {step} result {number}"
+        return ref if paragraphs == 1 else f"{ref} paragraph {paragraph}"
+    return f"step {step} row {paragraph}"
+
+
+def dedup_passages(
+    results: Union[str, ResultSet], step: int, fingerprints: PassageFingerprints
+) -> Tuple[str, int]:
+    """
+    Replace passages of a tool result that were already shown in an earlier step
+    by back-references such as "(same as step 3 result 2)", and remember the new
+    ones. Every paragraph of a fenced block (a ```search N``` article or a row of
+    a ```result``` block) is a passage; a "Source:" or "Query:" header line is
+    kept.
+
+    Returns:
+        The rewritten results and the number of passages replaced
+    """
+    replaced = 0
+
+    def rewrite(label: str, header: str, paragraphs: List[str]) -> str:
+        nonlocal replaced
+        rendered = []
+        for number, paragraph in enumerate(paragraphs, 1):
+            ref = fingerprints.lookup(paragraph)
+            if ref:
+                replaced += 1
+                rendered.append(f"(same as {ref})")
+            else:
+                fingerprints.add(
+                    paragraph, _block_ref(label, step, number, len(paragraphs))
+                )
+                rendered.append(paragraph)
+        return _join_header(header, "\n\n".join(rendered))
+
+    if isinstance(results, ResultSet):
+        text = "\n".join(
+            f"```{label}\n{rewrite(label, header, paragraphs)}\n```"
+            if label
+            else rewrite("", header, paragraphs)
+            for label, header, paragraphs in _blocks(results)
+        )
+        return text, replaced
+    if not FENCED_BLOCK_RE.search(results):
+        return rewrite("", *_split_block(results)), replaced
+    text = FENCED_BLOCK_RE.sub(
+        lambda m: (
+            f"```{m.group(1)}\n"
+            f"{rewrite(m.group(1).strip(), *_split_block(m.group(2)))}\n```"
+        ),
+        results,
+    )
+    return text, replaced
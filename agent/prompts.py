@@ -152,3 +152,35 @@ Assistant:
 
 **Begin by deconstructing the user's query into graph patterns to explore. Proceed step-by-step.**
 """
+
+PLANNING_PROMPT = """You are a research planner. Deconstruct the user's question into at most {max_subtopics} independent sub-topics that can be researched separately and in parallel. Each sub-topic must be a self-contained research question. Do not research anything yourself.
+
+Output each sub-topic wrapped in tags, one per line:
+<subtopic>first sub-topic question</subtopic>
+<subtopic>second sub-topic question</subtopic>
+"""
+
+SUBTOPIC_QUESTION_TEMPLATE = """{subtopic}
+
+(This is one sub-topic of the overall question: "{question}". Research ONLY this sub-topic and finish with a <report> about it.)"""
+
+SYNTHESIS_PROMPT = """You are a meticulous research editor. You are given the user's question and independent research reports, one per sub-topic. Merge them into ONE comprehensive, critically verified report:
+- Keep every inline citation, date and source evaluation from the sub-reports.
+- Reconcile or explicitly flag conflicting findings between sub-reports.
+- Acknowledge gaps and limitations reported by any sub-report.
+
+Wrap the merged analysis in `<report>[Full analysis]</report>`.
+"""
+
+FORCE_REPORT_PROMPT = """RESEARCH BUDGET ALMOST EXHAUSTED ({reason}). Do NOT issue any more queries. Write the final report NOW from the information gathered so far, wrapped in <report></report>. Explicitly acknowledge the sub-topics and claims that could not be verified within the budget."""
+
+SUMMARIZE_RESULTS_PROMPT = """You condense search engine or knowledge graph results for a research assistant. Extract the key facts relevant to the research question as a short bullet list. Keep every number, date and named entity exactly as given and end each bullet with its source in parentheses (publication or node and date, if present). Drop filler, opinions without a source and duplicate facts. Do not add facts of your own, and do not think or reason at length: output only the bullet list."""
+
+PRIOR_FINDINGS_PROMPT = """PRIOR FINDINGS from earlier research runs (with the age of their last verification):
+{findings}
+
+Findings marked FRESH were verified within the last {fresh_days} days: use them with their sources and do NOT search for them again. Findings marked STALE may be outdated: re-verify each one you rely on with a query before using it. Research whatever the prior findings do not cover as usual."""
+
+THINK_BUDGET_NUDGE_PROMPT = """Your reasoning budget for this step is used up. Do not think any further. Based on what you have considered so far, immediately write your next <{tag}></{tag}>, or your final <report></report> if the research is complete."""
+
+LOOP_CORRECTION_PROMPT = """LOOP DETECTED: {detail}. Repeating similar searches adds no new information. Do NOT repeat earlier queries. Pick a sub-topic you have not researched yet and write a substantially different query, or write the final <report> if all sub-topics are covered."""
@@ -0,0 +1,171 @@
+# results.py
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# Matches fenced tool output such as ```search 3 ... ``` or ```result ... ```
+FENCED_BLOCK_RE = re.compile(r"```([^\n`]*)\n(.*?)```", re.DOTALL)
+
+# Kinds of result sets
+RESULT_SEARCH = "search"
+RESULT_GRAPH = "graph"
+RESULT_TEXT = "text"
+
+
+class SearchHit:
+    """One search result: a passage and the source it came from, if known."""
+
+    __slots__ = ("text", "source", "score")
+
+    def __init__(self, text: str, source: str = "", score: float = None):
+        self.text = text
+        self.source = source
+        self.score = score
+
+    def body(self) -> str:
+        """The hit as the body of a ```search N``` block."""
+        text = self.text.strip()
+        return f"Source: {self.source}\n{text}" if self.source else text
+
+    def __repr__(self) -> str:
+        return f"SearchHit({self.source or self.text[:30]!r})"
+
+
+class GraphRow:
+    """One row of a graph query: a relationship between two nodes."""
+
+    __slots__ = ("start", "relationship", "end", "properties")
+
+    def __init__(
+        self,
+        start: str,
+        relationship: str,
+        end: str,
+        properties: Dict[str, Any] = None,
+    ):
+        self.start = start
+        self.relationship = relationship
+        self.end = end
+        self.properties = properties or {}
+
+    def render(self) -> str:
+        text = f"[{self.start}] -> {self.relationship} -> [{self.end}]"
+        if self.properties:
+            properties = "\n  ".join(json.dumps(self.properties, indent=2).splitlines())
+            text = f"{text}\n  Properties: {properties}"
+        return text
+
+    def __repr__(self) -> str:
+        return f"GraphRow({self.start!r}, {self.relationship!r}, {self.end!r})"
+
+
+class ResultSet:
+    """
+    The output of one tool call: search hits or graph rows for a query.
+
+    The prompt text (```search N``` blocks, or a ```result``` block for graph
+    rows) is rendered on the first str() and kept, so a result set passed
+    through packing, de-duplication and storage is rendered once. Consumers that
+    need the structure use items and blocks() instead of re-parsing the text.
+
+    Args:
+        query: The query the results answer
+        items: SearchHit or GraphRow objects
+        kind: RESULT_SEARCH, RESULT_GRAPH or RESULT_TEXT (free-form text kept in
+            message, e.g. from a custom search engine)
+        message: Text shown when there are no items
+    """
+
+    __slots__ = ("query", "items", "kind", "message", "_text")
+
+    def __init__(
+        self,
+        query: str,
+        items: Sequence[Union[SearchHit, GraphRow]] = (),
+        kind: str = RESULT_SEARCH,
+        message: str = "",
+    ):
+        self.query = query
+        self.items = list(items)
+        self.kind = kind
+        self.message = message
+        self._text: Optional[str] = None
+
+    @classmethod
+    def from_text(cls, query: str, text: str) -> "ResultSet":
+        """
+        Wrap tool output that is only available as text. ```search N``` blocks
+        become SearchHit objects (the text is parsed once, here); anything else is
+        kept as a RESULT_TEXT set. Either way str() returns text unchanged.
+        """
+        blocks = [
+            (match.group(1).strip(), match.group(2))
+            for match in FENCED_BLOCK_RE.finditer(text)
+        ]
+        if blocks and all(label.startswith("search") for label, _ in blocks):
+            hits = []
+            for _, body in blocks:
+                body = body.strip()
+                source = ""
+                if body.startswith("Source:"):
+                    header, _, body = body.partition("\n")
+                    source = header[len("Source:") :].strip()
+                hits.append(SearchHit(body, source))
+            result_set = cls(query, hits)
+        else:
+            result_set = cls(query, kind=RESULT_TEXT, message=text)
+        result_set._text = text
+        return result_set
+
+    def blocks(self) -> List[Tuple[str, str]]:
+        """
+        The (label, body) pairs of the rendered fenced blocks, e.g.
+        ("search 2", "Source: ...\\n..."); unfenced text has an empty label.
+        """
+        if self.kind == RESULT_SEARCH and self.items:
+            return [
+                (f"search {rank}", hit.body()) for rank, hit in enumerate(self.items, 1)
+            ]
+        if self.kind == RESULT_GRAPH:
+            rows = "\n\n".join(row.render() for row in self.items)
+            return [("result", f"Query: {self.query}\n\n{rows or self.message}")]
+        if self.kind == RESULT_TEXT:
+            blocks = [
+                (match.group(1).strip(), match.group(2))
+                for match in FENCED_BLOCK_RE.finditer(self.message)
+            ]
+            return blocks or [("", self.message)]
+        return [("", self.message)]
+
+    def render(self) -> str:
+        if self.kind == RESULT_TEXT:
+            return self.message
+        return "\n".join(
+            f"```{label}\n{body.strip()}\n```" if label else body
+            for label, body in self.blocks()
+        )
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = self.render()
+        return self._text
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __bool__(self) -> bool:
+        return bool(self.items or self.message)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __repr__(self) -> str:
+        return f"ResultSet({self.kind}, {self.query!r}, {len(self.items)} items)"
+
+
+def as_result_set(query: str, results: Union[str, ResultSet]) -> ResultSet:
+    """Tool output as a ResultSet, wrapping text returned by custom tools."""
+    if isinstance(results, ResultSet):
+        return results
+    return ResultSet.from_text(query, results)
@@ -0,0 +1,115 @@
+# routing.py
+
+import json
+import os
+from typing import Dict
+
+DEFAULT_MODEL = "Analysis-POC-DeepSeek-R1"
+
+# Stages of a research run that can be routed to different models
+STAGE_QUERY = "query"  # research loop turns that write the next query
+STAGE_PLAN = "plan"  # sub-topic planning in start_tree()
+STAGE_SEARCH_MOCK = "search_mock"  # LLM-mocked search results
+STAGE_SUMMARIZE = "summarize"  # condensing tool results
+STAGE_REPORT = "report"  # forced reports and the start_tree() synthesis
+STAGES = (STAGE_QUERY, STAGE_PLAN, STAGE_SEARCH_MOCK, STAGE_SUMMARIZE, STAGE_REPORT)
+
+
+class StageRoute:
+    """
+    Model settings for one stage.
+
+    Args:
+        model: Deployment name sent with the request
+        temperature: Sampling temperature; None uses the service default
+        max_tokens: Completion token limit; None uses the service default
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        temperature: float = 0.5,
+        max_tokens: int = None,
+    ):
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def kwargs(self) -> Dict:
+        """Keyword arguments for DeepseekClient.stream()/complete()."""
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+        }
+
+    def to_dict(self) -> Dict:
+        return self.kwargs()
+
+    def __repr__(self) -> str:
+        return (
+            f"StageRoute(model={self.model!r}, temperature={self.temperature}, "
+            f"max_tokens={self.max_tokens})"
+        )
+
+
+class ModelRouting:
+    """
+    Assigns a StageRoute to each stage of a research run. Stages without an
+    explicit route use the default route (R1 at temperature 0.5, as before),
+    except the search mock, which keeps the service's default temperature.
+
+    Args:
+        routes: Mapping of stage name (see STAGES) to StageRoute
+        default: Route for stages not in routes
+    """
+
+    def __init__(
+        self, routes: Dict[str, StageRoute] = None, default: StageRoute = None
+    ):
+        unknown = set(routes or {}) - set(STAGES)
+        if unknown:
+            raise ValueError(f"Unknown routing stages: {', '.join(sorted(unknown))}")
+        self.default = default or StageRoute()
+        self.routes = {STAGE_SEARCH_MOCK: StageRoute(self.default.model, None)}
+        self.routes.update(routes or {})
+
+    def route(self, stage: str) -> StageRoute:
+        return self.routes.get(stage, self.default)
+
+    @classmethod
+    def from_dict(cls, config: Dict) -> "ModelRouting":
+        """
+        Build a routing from plain data, e.g.
+        {"default": {"model": "..."}, "search_mock": {"max_tokens": 800}}
+        """
+        config = dict(config)
+        default = config.pop("default", None) or {}
+        # Settings a stage leaves out are taken from the default route
+        return cls(
+            routes={
+                stage: StageRoute(**{**default, **route})
+                for stage, route in config.items()
+            },
+            default=StageRoute(**default),
+        )
+
+    @classmethod
+    def from_env(cls) -> "ModelRouting":
+        """
+        Routing from the RESEARCH_MODEL_ROUTING environment variable: a path to a
+        JSON file (or inline JSON) in the from_dict() format. Defaults otherwise.
+        """
+        config = os.getenv("RESEARCH_MODEL_ROUTING")
+        if not config:
+            return cls()
+        if not config.lstrip().startswith("{"):
+            with open(config, encoding="utf-8") as f:
+                config = f.read()
+        return cls.from_dict(json.loads(config))
+
+    def to_dict(self) -> Dict:
+        return {
+            "default": self.default.to_dict(),
+            **{stage: self.route(stage).to_dict() for stage in STAGES},
+        }
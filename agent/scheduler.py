@@ -0,0 +1,143 @@
+# scheduler.py
+
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List
+
+# Lanes handed out by the scheduler: model completions and tool calls
+LANE_LLM = "llm"
+LANE_TOOL = "tool"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers (0.0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class ScheduledJob:
+    """
+    A research run competing for scheduler slots.
+
+    Args:
+        name: Label used in the statistics
+        priority: Higher values are served first
+        deadline: Absolute time.monotonic() deadline; earlier deadlines are served
+            first among jobs of the same priority
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str = None, priority: int = 0, deadline: float = None):
+        self.job_id = next(self._ids)
+        self.name = name or f"job-{self.job_id}"
+        self.priority = priority
+        self.deadline = deadline
+        self.grants = {}  # lane -> number of slots granted so far
+        self.wait_seconds = 0.0
+
+
+class _Lane:
+    """A fixed number of concurrency slots and the requests queued for them."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.in_use = 0
+        self.waiting = []  # (job, sequence number, enqueue time)
+        self.max_queue_depth = 0
+        self.grants = 0
+        self.waits = deque(maxlen=10000)
+
+    def sort_key(self, name: str, entry):
+        job, sequence, _ = entry
+        return (
+            -job.priority,
+            job.deadline if job.deadline is not None else math.inf,
+            # Fair share: among equals, the job served least in this lane goes first
+            job.grants.get(name, 0),
+            sequence,
+        )
+
+
+class ResearchScheduler:
+    """
+    Hands out LLM and tool concurrency slots to concurrent research jobs.
+
+    Each lane has a fixed number of slots. When a lane is full, requests queue
+    and are granted by priority, then earliest deadline, then fewest slots
+    already granted to the job (fair sharing), then arrival order.
+
+    Args:
+        llm_slots: Concurrent model completions (shared inference quota)
+        tool_slots: Concurrent search/Cypher calls
+    """
+
+    def __init__(self, llm_slots: int = 4, tool_slots: int = 8):
+        self._lanes = {LANE_LLM: _Lane(llm_slots), LANE_TOOL: _Lane(tool_slots)}
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+
+    def job(self, name: str = None, priority: int = 0, deadline: float = None):
+        """Register a new job; see ScheduledJob for the arguments."""
+        return ScheduledJob(name=name, priority=priority, deadline=deadline)
+
+    @contextmanager
+    def slot(self, lane: str, job: ScheduledJob):
+        """Hold one slot of the given lane for the duration of the with-block."""
+        self.acquire(lane, job)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def acquire(self, lane: str, job: ScheduledJob):
+        state = self._lanes[lane]
+        enqueued = time.monotonic()
+        entry = (job, next(self._sequence), enqueued)
+        with self._condition:
+            state.waiting.append(entry)
+            state.max_queue_depth = max(state.max_queue_depth, len(state.waiting))
+            while not (
+                state.in_use < state.capacity
+                and min(state.waiting, key=lambda e: state.sort_key(lane, e)) is entry
+            ):
+                self._condition.wait()
+            state.waiting.remove(entry)
+            state.in_use += 1
+            state.grants += 1
+            waited = time.monotonic() - enqueued
+            state.waits.append(waited)
+            job.grants[lane] = job.grants.get(lane, 0) + 1
+            job.wait_seconds += waited
+            # Another slot may still be free for the next waiter
+            self._condition.notify_all()
+
+    def release(self, lane: str):
+        with self._condition:
+            self._lanes[lane].in_use -= 1
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Current queue depth, utilisation and wait-time percentiles per lane."""
+        with self._condition:
+            report = {}
+            for name, state in self._lanes.items():
+                waits = list(state.waits)
+                report[name] = {
+                    "capacity": state.capacity,
+                    "in_use": state.in_use,
+                    "queue_depth": len(state.waiting),
+                    "max_queue_depth": state.max_queue_depth,
+                    "grants": state.grants,
+                    "wait_p50_seconds": round(percentile(waits, 50), 4),
+                    "wait_p99_seconds": round(percentile(waits, 99), 4),
+                    "wait_max_seconds": round(max(waits, default=0.0), 4),
+                }
+            return report
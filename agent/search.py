@@ -7,14 +7,35 @@ from azure.ai.inference.models import SystemMessage, UserMessage
 from azure.core.credentials import AzureKeyCredential
 
 from agent.prompts import MOCK_SEARCH_ENGINE_PROMPT
+from agent.results import ResultSet
+from agent.routing import STAGE_SEARCH_MOCK, ModelRouting, StageRoute
+from agent.singleflight import tool_calls
+from agent.tracing import span
 from agent.utils import parse_and_print_token
 
 
-def mock_search_engine(query: str) -> str:
+def mock_search_engine(query: str, route: StageRoute = None) -> ResultSet:
     """
     Mocks search engine results by calling the model with a 'mocker' prompt.
     We do not want chain-of-thought from the mocker, so we set ignore_think=True.
+    The model settings come from route, by default the "search_mock" stage of
+    ModelRouting.from_env(); a fast non-reasoning model is enough here.
+    Concurrent identical requests (same query and route) share one model call,
+    and its text is parsed into a ResultSet once.
     """
+    route = route or ModelRouting.from_env().route(STAGE_SEARCH_MOCK)
+    key = (
+        "mock_search",
+        query.strip(),
+        route.model,
+        route.temperature,
+        route.max_tokens,
+    )
+    with span("tool.mock_search", model=route.model):
+        return tool_calls.do(key, _request_mock_results, query, route)
+
+
+def _request_mock_results(query: str, route: StageRoute) -> ResultSet:
     endpoint = os.environ["AZURE_DEEPSEEK_ENDPOINT"]
     api_key = os.environ["AZURE_DEEPSEEK_API_KEY"]
     client = ChatCompletionsClient(
@@ -27,7 +48,9 @@ def mock_search_engine(query: str) -> str:
             SystemMessage(content=MOCK_SEARCH_ENGINE_PROMPT),
             UserMessage(content=query),
         ],
-        model="Analysis-POC-DeepSeek-R1",
+        model=route.model,
+        temperature=route.temperature,
+        max_tokens=route.max_tokens,
         stream=True,
     )
 
@@ -44,4 +67,4 @@ def mock_search_engine(query: str) -> str:
         )
         full_response += processed_text
 
-    return full_response
+    return ResultSet.from_text(query, full_response)
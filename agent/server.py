@@ -0,0 +1,448 @@
+# server.py
+
+import argparse
+import collections
+import functools
+import itertools
+import json
+import queue
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List
+
+import dotenv
+
+from agent.events import BodyToken, ReportChunk, Stopped, ThinkToken, ToolResult
+from agent.jobs import JOB_OPTIONS, default_agent_factory
+from agent.scheduler import ResearchScheduler, percentile
+from agent.singleflight import tool_calls
+from agent.visualization import ResearchPathVisualizer
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+# Streaming token events, dropped from a finished job once no client reads them
+TOKEN_EVENT_TYPES = frozenset(
+    event.type for event in (ThinkToken, BodyToken, ReportChunk)
+)
+
+# Characters of a tool result kept in a job's event log; the research path has
+# the full text
+MAX_EVENT_RESULT_CHARS = 2000
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the job queue is full."""
+
+
+class ResearchJob:
+    """One submitted question, its progress events and its results."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, question: str, options: Dict):
+        self.job_id = str(next(self._ids))
+        self.question = question
+        self.options = options
+        self.status = STATUS_QUEUED
+        self.events: List[Dict] = []
+        self.report = None
+        self.stop_reason = None
+        self.error = None
+        self.research_path = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._readers = 0
+        self._compacted = False
+        self._condition = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (STATUS_DONE, STATUS_FAILED)
+
+    def publish(self, event: Dict):
+        with self._condition:
+            self.events.append(event)
+            self._condition.notify_all()
+
+    def finish(self, status: str):
+        with self._condition:
+            self.status = status
+            self.finished = time.time()
+            self._compact()
+            self._condition.notify_all()
+
+    def open_reader(self):
+        """Register an event stream client; events are not compacted under it."""
+        with self._condition:
+            self._readers += 1
+
+    def close_reader(self):
+        with self._condition:
+            self._readers -= 1
+            self._compact()
+
+    def _compact(self):
+        """
+        Drop the token events of a finished job that no client is reading. The
+        report stays in the "stopped" event; later clients replay the rest.
+        """
+        if self.done and not self._readers and not self._compacted:
+            self.events = [e for e in self.events if e["type"] not in TOKEN_EVENT_TYPES]
+            self._compacted = True
+
+    def wait_for_events(self, start: int, timeout: float = 15.0) -> List[Dict]:
+        """Events from index start on, blocking until there is one or the job ends."""
+        with self._condition:
+            if len(self.events) <= start and not self.done:
+                self._condition.wait(timeout)
+            return self.events[start:]
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.job_id,
+            "question": self.question,
+            "status": self.status,
+            "stop_reason": self.stop_reason,
+            "error": self.error,
+            "events": len(self.events),
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+def truncate_event(event: Dict) -> Dict:
+    """Shorten the results of a tool_result event for the retained event log."""
+    if event["type"] != ToolResult.type:
+        return event
+    results = event["results"]
+    if len(results) <= MAX_EVENT_RESULT_CHARS:
+        return event
+    omitted = len(results) - MAX_EVENT_RESULT_CHARS
+    truncated = results[:MAX_EVENT_RESULT_CHARS]
+    return {**event, "results": f"{truncated}\n[... {omitted} characters omitted]"}
+
+
+class ResearchService:
+    """
+    Runs research jobs on a bounded pool of ResearchAgent workers.
+
+    Args:
+        workers: Number of jobs researched concurrently
+        queue_size: Maximum number of jobs waiting for a worker
+        agent_factory: Callable (options, scheduler) -> ResearchAgent
+        scheduler: Optional ResearchScheduler shared by all agents
+        keep_token_events: Also record think/body token events for SSE clients
+            (a finished job drops them once no client is streaming its events)
+        max_finished_jobs: Finished jobs kept for GET /jobs/<id>; the oldest
+            are evicted first
+        finished_job_ttl: Seconds a finished job is kept at most
+        duration_samples: Recent job durations kept for the /metrics percentiles
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        queue_size: int = 16,
+        agent_factory: Callable = default_agent_factory,
+        scheduler: ResearchScheduler = None,
+        keep_token_events: bool = True,
+        max_finished_jobs: int = 256,
+        finished_job_ttl: float = 3600.0,
+        duration_samples: int = 1024,
+    ):
+        self.agent_factory = agent_factory
+        self.scheduler = scheduler
+        self.keep_token_events = keep_token_events
+        self.max_finished_jobs = max_finished_jobs
+        self.finished_job_ttl = finished_job_ttl
+        self.jobs: Dict[str, ResearchJob] = {}
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._job_seconds = collections.deque(maxlen=duration_samples)
+        # Totals since start, including evicted jobs
+        self._submitted = 0
+        self._finished = collections.Counter()
+        self._workers = [
+            threading.Thread(
+                target=self._work, name=f"research-worker-{i}", daemon=True
+            )
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, question: str, options: Dict = None) -> ResearchJob:
+        options = options or {}
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+
+        job = ResearchJob(question, options)
+        with self._lock:
+            self.jobs[job.job_id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self.jobs[job.job_id]
+            raise QueueFullError("Research job queue is full")
+        with self._lock:
+            self._submitted += 1
+        return job
+
+    def _evict(self):
+        """Forget finished jobs past finished_job_ttl or beyond max_finished_jobs."""
+        finished = sorted(
+            (job for job in self.jobs.values() if job.done),
+            key=lambda job: job.finished,
+        )
+        expired = time.time() - self.finished_job_ttl
+        excess = len(finished) - self.max_finished_jobs
+        for index, job in enumerate(finished):
+            if index < excess or job.finished < expired:
+                del self.jobs[job.job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            with self._lock:
+                self._active += 1
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    if job.started is not None:
+                        self._job_seconds.append(job.finished - job.started)
+                    self._finished[job.status] += 1
+                    self._evict()
+                self._queue.task_done()
+
+    def _run(self, job: ResearchJob):
+        job.started = time.time()
+        job.status = STATUS_RUNNING
+        agent = None
+        try:
+            agent = self.agent_factory(job.options, self.scheduler)
+            for event in agent.start_stream(job.question):
+                if not self.keep_token_events and isinstance(
+                    event, (ThinkToken, BodyToken, ReportChunk)
+                ):
+                    continue
+                if isinstance(event, Stopped):
+                    job.report = event.report
+                    job.stop_reason = event.reason
+                job.publish(truncate_event(event.to_dict()))
+            job.research_path = agent.research_path
+            job.finish(STATUS_DONE)
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            if agent is not None:
+                job.research_path = agent.research_path
+            job.publish({"type": "error", "error": job.error})
+            job.finish(STATUS_FAILED)
+
+    def metrics(self) -> Dict:
+        with self._lock:
+            self._evict()
+            durations = list(self._job_seconds)
+            metrics = {
+                "active_jobs": self._active,
+                "queue_length": self._queue.qsize(),
+                "workers": len(self._workers),
+                "jobs_total": self._submitted,
+                "jobs_done": self._finished[STATUS_DONE],
+                "jobs_failed": self._finished[STATUS_FAILED],
+                "jobs_retained": len(self.jobs),
+                "job_seconds_p50": round(percentile(durations, 50), 3),
+                "job_seconds_p99": round(percentile(durations, 99), 3),
+            }
+        metrics["single_flight"] = tool_calls.stats()
+        if self.scheduler is not None:
+            metrics["scheduler"] = self.scheduler.stats()
+        return metrics
+
+
+class ResearchRequestHandler(BaseHTTPRequestHandler):
+    """
+    HTTP API of the research service:
+      POST /jobs                  {"question": ..., "options": {...}} -> 202
+      GET  /jobs                  all job summaries
+      GET  /jobs/<id>             job summary
+      GET  /jobs/<id>/events      Server-Sent Events, replayed from the start
+      GET  /jobs/<id>/report      final report (text/markdown)
+      GET  /jobs/<id>/path.json   ResearchPathVisualizer JSON export
+      GET  /jobs/<id>/path.mmd    ResearchPathVisualizer Mermaid diagram
+      GET  /metrics               service metrics
+    """
+
+    service: ResearchService = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep the console for the agents; access logs are not needed
+        pass
+
+    def _send(self, status: int, body: str, content_type: str = "application/json"):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _send_json(self, status: int, data):
+        self._send(status, json.dumps(data, indent=2, default=str))
+
+    def _job(self, job_id: str) -> ResearchJob:
+        job = self.service.jobs.get(job_id)
+        if job is None:
+            self._send_json(404, {"error": f"Unknown job {job_id}"})
+        return job
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            self._send_json(404, {"error": "Not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            question = request["question"]
+            job = self.service.submit(question, request.get("options"))
+        except (KeyError, TypeError, ValueError) as e:
+            self._send_json(400, {"error": f"Invalid job request: {e}"})
+            return
+        except QueueFullError as e:
+            self._send_json(503, {"error": str(e)})
+            return
+        self._send_json(202, job.summary())
+
+    def do_GET(self):
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+
+        if parts == ["metrics"]:
+            self._send_json(200, self.service.metrics())
+        elif parts == ["jobs"]:
+            jobs = list(self.service.jobs.values())
+            self._send_json(200, [job.summary() for job in jobs])
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job:
+                self._send_json(200, job.summary())
+        elif len(parts) == 3 and parts[0] == "jobs":
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if parts[2] == "events":
+                self._stream_events(job)
+            elif not job.done:
+                self._send_json(409, {"error": "Job has not finished", **job.summary()})
+            elif parts[2] == "report":
+                self._send(200, job.report or "", "text/markdown")
+            elif parts[2] == "path.json":
+                visualizer = ResearchPathVisualizer(job.research_path or [])
+                self._send(200, visualizer.to_json())
+            elif parts[2] == "path.mmd":
+                visualizer = ResearchPathVisualizer(job.research_path or [])
+                self._send(200, visualizer.to_mermaid(), "text/plain")
+            else:
+                self._send_json(404, {"error": "Not found"})
+        else:
+            self._send_json(404, {"error": "Not found"})
+
+    def _stream_events(self, job: ResearchJob):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sent = 0
+        job.open_reader()
+        try:
+            while True:
+                events = job.wait_for_events(sent)
+                for event in events:
+                    data = json.dumps(event, default=str)
+                    message = f"id: {sent}\nevent: {event['type']}\ndata: {data}\n\n"
+                    self.wfile.write(message.encode("utf-8"))
+                    sent += 1
+                if not events:
+                    # Keep idle connections alive through proxies
+                    self.wfile.write(b": keep-alive\n\n")
+                self.wfile.flush()
+                if job.done and sent >= len(job.events):
+                    self.wfile.write(b"event: end\ndata: {}\n\n")
+                    self.wfile.flush()
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            return
+        finally:
+            job.close_reader()
+
+
+def create_server(
+    service: ResearchService, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """Create (but do not start) an HTTP server. Port 0 picks a free port."""
+    handler = type("BoundResearchRequestHandler", (ResearchRequestHandler,), {})
+    handler.service = service
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    dotenv.load_dotenv()
+
+    parser = argparse.ArgumentParser(
+        description="Run the research agent as an HTTP service"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--llm-slots", type=int, default=None)
+    parser.add_argument("--tool-slots", type=int, default=8)
+    parser.add_argument("--max-finished-jobs", type=int, default=256)
+    parser.add_argument("--job-ttl", type=float, default=3600.0)
+    parser.add_argument(
+        "--corpus-dir", default=None, help='Document directory for tool="local" jobs'
+    )
+    args = parser.parse_args()
+
+    scheduler = None
+    if args.llm_slots:
+        scheduler = ResearchScheduler(
+            llm_slots=args.llm_slots, tool_slots=args.tool_slots
+        )
+    service = ResearchService(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        agent_factory=functools.partial(
+            default_agent_factory, corpus_dir=args.corpus_dir
+        ),
+        scheduler=scheduler,
+        max_finished_jobs=args.max_finished_jobs,
+        finished_job_ttl=args.job_ttl,
+    )
+    server = create_server(service, args.host, args.port)
+    print(f"Research service listening on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# singleflight.py
+
+import threading
+from typing import Any, Callable, Dict, Hashable
+
+from agent.tracing import span
+
+
+class _Call:
+    """The outcome of one in-flight execution."""
+
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls: while a call for a key is running,
+    further calls with the same key wait for it and receive its result (or its
+    exception) instead of executing again. Nothing is cached once the call
+    finishes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """Run fn(*args, **kwargs) unless a call with the same key is in flight."""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            with span("singleflight.wait"):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        """Calls made, executions performed and calls saved by coalescing."""
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls)}
+
+
+# Process-wide layer shared by all agents for search and Cypher calls
+tool_calls = SingleFlight()
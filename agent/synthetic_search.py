@@ -0,0 +1,165 @@
+# synthetic_search.py
+
+import hashlib
+import math
+import random
+import time
+
+from agent.results import ResultSet, SearchHit
+from agent.utils import STOPWORDS, tokenize
+
+# Sentence templates; {topic} and {entity} are filled from the query, the rest
+# from the vocabularies below.
+SENTENCE_TEMPLATES = [
+    "Analysts at {source} reported that {topic} {trend} by {percent}% in {period}.",
+    "According to {source}, {entity} faces {risk} that could affect {topic}.",
+    "A {period} review by {source} found {topic} to be {assessment}.",
+    "{entity} announced {event}, which {source} described as {assessment}.",
+    "Critics cited by {source} argue that {topic} is exposed to {risk}.",
+    "Data from {source} shows {metric} for {entity} {trend} {percent}% over {period}.",
+]
+
+VOCABULARY = {
+    "source": [
+        "Reuters",
+        "Bloomberg",
+        "the SEC",
+        "CoinDesk",
+        "the Financial Times",
+        "Messari",
+        "a university research group",
+        "The Wall Street Journal",
+    ],
+    "trend": ["rose", "fell", "stabilized", "fluctuated", "grew", "declined"],
+    "period": ["Q1 2024", "Q2 2024", "Q3 2024", "Q4 2024", "the past 12 months"],
+    "risk": [
+        "regulatory scrutiny",
+        "liquidity shortfalls",
+        "network outages",
+        "competitive pressure",
+        "concentration risk",
+    ],
+    "assessment": [
+        "promising but volatile",
+        "overvalued",
+        "undervalued",
+        "a significant development",
+        "largely speculative",
+    ],
+    "event": [
+        "a strategic partnership",
+        "a protocol upgrade",
+        "a funding round",
+        "a security audit",
+        "an exchange listing",
+    ],
+    "metric": ["trading volume", "active addresses", "revenue", "market share"],
+}
+
+
+class SyntheticSearchEngine:
+    """
+    Template-driven, zero-LLM stand-in for mock_search_engine.
+
+    Results are seeded by the query text, so the same query always produces the
+    same hits (```search N``` blocks). An artificial latency can be injected to emulate
+    a real backend without paying for one.
+
+    Args:
+        result_count: Number of ```search N``` blocks per response
+        sentences_per_result: Sentences per result paragraph (controls size)
+        latency: Latency distribution, one of "none", "fixed", "uniform",
+            "normal", "lognormal" or "exponential"
+        latency_mean: Mean latency in seconds
+        latency_spread: Distribution spread in seconds (uniform half-width,
+            normal/lognormal standard deviation); ignored for fixed/exponential
+        seed: Extra seed mixed into every query seed and the latency sampler
+    """
+
+    LATENCY_DISTRIBUTIONS = (
+        "none",
+        "fixed",
+        "uniform",
+        "normal",
+        "lognormal",
+        "exponential",
+    )
+
+    def __init__(
+        self,
+        result_count: int = 5,
+        sentences_per_result: int = 4,
+        latency: str = "none",
+        latency_mean: float = 0.0,
+        latency_spread: float = 0.0,
+        seed: int = 0,
+    ):
+        if latency not in self.LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"latency must be one of {', '.join(self.LATENCY_DISTRIBUTIONS)}"
+            )
+        self.result_count = result_count
+        self.sentences_per_result = sentences_per_result
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_spread = latency_spread
+        self.seed = seed
+        self._latency_rng = random.Random(seed)
+
+    def _query_rng(self, query: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{query}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def sample_latency(self) -> float:
+        """Draw one artificial latency (in seconds) from the configured distribution."""
+        rng = self._latency_rng
+        mean, spread = self.latency_mean, self.latency_spread
+        if self.latency == "none":
+            return 0.0
+        if self.latency == "fixed":
+            return mean
+        if self.latency == "uniform":
+            return max(0.0, rng.uniform(mean - spread, mean + spread))
+        if self.latency == "normal":
+            return max(0.0, rng.gauss(mean, spread))
+        if self.latency == "lognormal":
+            if mean <= 0:
+                return 0.0
+            # Parametrize so that the distribution has the requested mean/stddev
+            variance_ratio = 1.0 + (spread / mean) ** 2
+            sigma_log = math.sqrt(math.log(variance_ratio))
+            mu_log = math.log(mean) - sigma_log**2 / 2
+            return rng.lognormvariate(mu_log, sigma_log)
+        return rng.expovariate(1.0 / mean) if mean > 0 else 0.0
+
+    def generate(self, query: str) -> ResultSet:
+        """Deterministically generate the results for a query, without any delay."""
+        rng = self._query_rng(query)
+        keywords = tokenize(query) or ["the market"]
+        topic = " ".join(keywords[:3])
+        entities = [
+            word.strip("?!.,;:\"'")
+            for word in query.split()
+            if word[:1].isupper() and word.lower() not in STOPWORDS
+        ] or [keyword.capitalize() for keyword in keywords]
+
+        hits = []
+        for _ in range(self.result_count):
+            sentences = []
+            for _ in range(self.sentences_per_result):
+                fields = {name: rng.choice(words) for name, words in VOCABULARY.items()}
+                fields["topic"] = topic
+                fields["entity"] = rng.choice(entities)
+                fields["percent"] = rng.randint(1, 95)
+                sentences.append(rng.choice(SENTENCE_TEMPLATES).format(**fields))
+            hits.append(SearchHit(" ".join(sentences)))
+        return ResultSet(query, hits)
+
+    def __call__(self, query: str) -> ResultSet:
+        delay = self.sample_latency()
+        if delay:
+            time.sleep(delay)
+        return self.generate(query)
+
+
+synthetic_search_engine = SyntheticSearchEngine()
@@ -0,0 +1,141 @@
+# think_store.py
+
+import json
+import logging
+import queue
+import tempfile
+import threading
+import weakref
+import zlib
+from pathlib import Path
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _write_loop(
+    records: queue.Queue,
+    log_path: Path,
+    index_path: Path,
+    entries: Dict[str, Tuple[int, int]],
+    lock: threading.Lock,
+):
+    """
+    Writer thread of a ThinkStore. It holds the store's parts, not the store, so
+    that the store can be garbage collected; None stops it.
+    """
+    while True:
+        item = records.get()
+        try:
+            if item is None:
+                return
+            key, text = item
+            compressed = zlib.compress(text.encode("utf-8"), 6)
+            with open(log_path, "ab") as log:
+                offset = log.tell()
+                log.write(compressed)
+            with open(index_path, "a", encoding="utf-8") as index:
+                record = {
+                    "key": key,
+                    "offset": offset,
+                    "length": len(compressed),
+                    "chars": len(text),
+                }
+                index.write(json.dumps(record) + "\n")
+            with lock:
+                entries[key] = (offset, len(compressed))
+        except Exception:
+            # Losing one step's reasoning must not stop the writer
+            logger.exception("Could not store chain-of-thought %r", item[0])
+        finally:
+            records.task_done()
+
+
+def _stop_writer(records: queue.Queue, thread: threading.Thread):
+    """Let the writer finish what is queued, then stop it."""
+    records.put(None)
+    thread.join()
+
+
+class ThinkRef:
+    """Reference to captured chain-of-thought; str(ref) loads and decompresses it."""
+
+    __slots__ = ("store", "key")
+
+    def __init__(self, store: "ThinkStore", key: str):
+        self.store = store
+        self.key = key
+
+    def __str__(self) -> str:
+        return self.store.get(self.key)
+
+    def __repr__(self) -> str:
+        return f"ThinkRef({self.key})"
+
+
+class ThinkStore:
+    """
+    Compressed side store for chain-of-thought text.
+
+    submit() only queues the text; a background thread compresses it and appends
+    it to think.log, with one JSON line per record in think.index.jsonl
+    ({"key", "offset", "length", "chars"}), so captured reasoning never enters
+    the prompt and costs the research loop next to nothing.
+
+    close() (or garbage collection, or interpreter exit) writes out whatever is
+    still queued and stops the writer thread.
+
+    Args:
+        directory: Where think.log and think.index.jsonl are written; a temporary
+            directory is used if not given
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = Path(directory or tempfile.mkdtemp(prefix="research-think-"))
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.directory / "think.log"
+        self.index_path = self.directory / "think.index.jsonl"
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=_write_loop,
+            args=(self._queue, self.log_path, self.index_path, self._index, self._lock),
+            name="think-store-writer",
+            daemon=True,
+        )
+        self._thread.start()
+        # Runs on close(), when the store is collected or at interpreter exit
+        self._finalizer = weakref.finalize(
+            self, _stop_writer, self._queue, self._thread
+        )
+
+    def submit(self, key: str, text: str) -> ThinkRef:
+        """Queue text for compression and storage; returns immediately."""
+        if not self._finalizer.alive:
+            raise RuntimeError("ThinkStore is closed")
+        self._queue.put((key, text))
+        return ThinkRef(self, key)
+
+    def close(self):
+        """Write out the queued texts and stop the writer thread."""
+        self._finalizer()
+
+    def flush(self):
+        """Block until every submitted text has been written."""
+        if self._thread.is_alive():
+            self._queue.join()
+
+    def get(self, key: str) -> str:
+        with self._lock:
+            entry = self._index.get(key)
+        if entry is None:
+            self.flush()
+            with self._lock:
+                entry = self._index.get(key)
+        if entry is None:
+            return ""
+        offset, length = entry
+        with open(self.log_path, "rb") as log:
+            log.seek(offset)
+            return zlib.decompress(log.read(length)).decode("utf-8")
@@ -0,0 +1,136 @@
+# tracing.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List
+
+_NULL_SPAN = nullcontext()
+
+
+class Tracer:
+    """
+    Tracing hook interface. The base class records nothing: span() hands out a
+    shared no-op context manager, so instrumented code costs one call per span
+    when tracing is off.
+    """
+
+    enabled = False
+
+    def span(self, name: str, **args):
+        """Context manager timing the enclosed block as a span."""
+        return _NULL_SPAN
+
+    def record(self, name: str, start: float, end: float, **args):
+        """Record a span measured elsewhere (time.perf_counter() seconds)."""
+
+    def instant(self, name: str, **args):
+        """Record a point-in-time event."""
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer = None) -> Tracer:
+    """Install a process-wide tracer (None restores the no-op tracer)."""
+    global _tracer
+    previous = _tracer
+    _tracer = tracer or Tracer()
+    return previous
+
+
+def span(name: str, **args):
+    """Span on the current process-wide tracer."""
+    return _tracer.span(name, **args)
+
+
+class ChromeTraceExporter(Tracer):
+    """
+    Tracer that keeps spans in memory and writes them as Chrome trace-event JSON,
+    which chrome://tracing, Perfetto and speedscope show as a flame chart (one
+    row per thread, nested by time).
+
+    Args:
+        category: Category stored with every event
+    """
+
+    enabled = True
+
+    def __init__(self, category: str = "research"):
+        self.category = category
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._events: List[Dict] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _microseconds(self, seconds: float) -> float:
+        return round((seconds - self._origin) * 1e6, 3)
+
+    def _append(self, event: Dict):
+        thread = threading.current_thread()
+        event.update(cat=self.category, pid=self._pid, tid=thread.ident)
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter(), **args)
+
+    def record(self, name: str, start: float, end: float, **args):
+        self._append(
+            {
+                "name": name,
+                "ph": "X",
+                "ts": self._microseconds(start),
+                "dur": round(max(0.0, end - start) * 1e6, 3),
+                "args": args,
+            }
+        )
+
+    def instant(self, name: str, **args):
+        self._append(
+            {
+                "name": name,
+                "ph": "i",
+                "s": "t",
+                "ts": self._microseconds(time.perf_counter()),
+                "args": args,
+            }
+        )
+
+    def events(self) -> List[Dict]:
+        with self._lock:
+            thread_names = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._threads.items()
+            ]
+            return thread_names + sorted(self._events, key=lambda e: e["ts"])
+
+    def write(self, output_file: str) -> str:
+        """Write the trace to output_file and return the path."""
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(output_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {"traceEvents": self.events(), "displayTimeUnit": "ms"}, f, default=str
+            )
+        return output_file
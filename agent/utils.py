@@ -1,6 +1,16 @@
 # utils.py
 
 import re
+from typing import List
+
+# Very common English words that carry no signal for lexical matching
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the "
+    "this to was were will with what which who how why".split()
+)
+
+# An inline citation such as "(Reuters, 2024)" or "(SEC filing, March 2023)"
+CITATION_RE = re.compile(r"\([^()]*\b(?:19|20)\d{2}\b[^()]*\)")
 
 
 def colorize_think_text(text: str) -> str:
@@ -13,21 +23,77 @@ def colorize_think_text(text: str) -> str:
 
 
 def extract_query_content(text: str) -> str:
-    """Extract content between <query> tags."""
-    match = re.search(r"<query>(.*?)</query>", text, re.DOTALL)
+    """
+    Extract content between <query> tags. The closing tag may be missing at the
+    end of the text, since it is a stop sequence the service can strip.
+    """
+    match = re.search(r"<query>(.*?)(?:</query>|$)", text, re.DOTALL)
     if match:
         return match.group(1).strip()
     return ""
 
 
 def extract_cypher_content(text: str) -> str:
-    """Extract content between <cypher> tags."""
-    match = re.search(r"<cypher>(.*?)</cypher>", text, re.DOTALL)
+    """Extract content between <cypher> tags (the closing tag may be missing at the end)."""
+    match = re.search(r"<cypher>(.*?)(?:</cypher>|$)", text, re.DOTALL)
     if match:
         return match.group(1).strip()
     return ""
 
 
+def extract_subtopics(text: str) -> List[str]:
+    """Extract the content of every <subtopic> tag, in order."""
+    return [
+        match.strip()
+        for match in re.findall(r"<subtopic>(.*?)</subtopic>", text, re.DOTALL)
+        if match.strip()
+    ]
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase the text and split it into alphanumeric terms, dropping stopwords."""
+    return [
+        term for term in re.findall(r"[a-z0-9]+", text.lower()) if term not in STOPWORDS
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def format_search_results(paragraphs: List[str]) -> str:
+    """Render paragraphs in the ```search N``` block format the agent expects."""
+    return "\n".join(
+        f"```search {idx}\n{paragraph.strip()}\n```"
+        for idx, paragraph in enumerate(paragraphs, 1)
+    )
+
+
+def split_think_segments(token_text: str, inside_think: bool):
+    """
+    Split a chunk of streamed text into (is_think, text) segments, dropping the
+    <think>/</think> delimiters themselves.
+
+    Returns:
+      - segments: list of (is_think, text) tuples with non-empty text
+      - new_inside_think: updated boolean state
+    """
+    segments = []
+    remaining = token_text
+    while remaining:
+        tag = "</think>" if inside_think else "<think>"
+        idx = remaining.find(tag)
+        if idx == -1:
+            segments.append((inside_think, remaining))
+            break
+        if idx:
+            segments.append((inside_think, remaining[:idx]))
+        remaining = remaining[idx + len(tag) :]
+        inside_think = not inside_think
+    return segments, inside_think
+
+
 def parse_and_print_token(
     token_text: str, inside_think: bool, ignore_think: bool, verbose: bool
 ):
@@ -1,7 +1,16 @@
 import json
+import threading
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, List
 
+from agent.tracing import span
+
+
+def mermaid_label(text: str) -> str:
+    """Escape text for a quoted Mermaid node label."""
+    return text.replace('"', "#quot;").replace("\n", "\\n")
+
 
 class ResearchPathVisualizer:
     def __init__(self, research_path: List[Dict]):
@@ -9,6 +18,10 @@ class ResearchPathVisualizer:
 
     def to_mermaid(self) -> str:
         """Generate a detailed Mermaid flowchart of the research process."""
+        with span("export.mermaid", steps=len(self.research_path)):
+            return self._to_mermaid()
+
+    def _to_mermaid(self) -> str:
         mermaid = [
             "```mermaid",
             "flowchart TD",
@@ -21,22 +34,85 @@ class ResearchPathVisualizer:
 
         # Start node
         mermaid.append('    start["🔍 Initial Question"]')
-        last_node = "start"
+        self._render_steps(self.research_path, mermaid, "start")
+
+        mermaid.append("```")
+        return "\n".join(mermaid)
+
+    def _render_steps(
+        self, steps: List[Dict], mermaid: List[str], last_node: str, prefix: str = ""
+    ) -> str:
+        """
+        Append the nodes and edges for a list of steps, starting from last_node.
+        Tree-mode steps ("plan", "branch", "synthesis") fan out from the plan node
+        into one sub-chain per branch and fan back in at the synthesis node.
+
+        Returns:
+            The ID of the last node rendered
+        """
+        plan_node = None
+        branch_ends = []
+
+        for idx, step in enumerate(steps, 1):
+            step_type = step.get("type")
+
+            if step_type == "plan":
+                plan_node = f"{prefix}plan_{idx}"
+                subtopics = len(step.get("subtopics", []))
+                mermaid.append(
+                    f'    {plan_node}["🗂️ Plan:\\n{subtopics} sub-topics"]:::thinking'
+                )
+                mermaid.append(f"    {last_node} --> {plan_node}")
+                last_node = plan_node
+                continue
+
+            if step_type == "branch":
+                branch_prefix = f"{prefix}b{idx}_"
+                branch_id = f"{branch_prefix}topic"
+                topic_text = mermaid_label(self._truncate_text(step["query"]))
+                branch_number = len(branch_ends) + 1
+                mermaid.append(
+                    f"    subgraph {branch_prefix}tree [Sub-topic {branch_number}]"
+                )
+                mermaid.append(
+                    f'    {branch_id}["🧭 Sub-topic:\\n{topic_text}"]:::query'
+                )
+                branch_ends.append(
+                    self._render_steps(
+                        step.get("path", []), mermaid, branch_id, branch_prefix
+                    )
+                )
+                mermaid.append("    end")
+                mermaid.append(f"    {plan_node or last_node} --> {branch_id}")
+                continue
+
+            if step_type == "synthesis":
+                synthesis_id = f"{prefix}synthesis_{idx}"
+                mermaid.append(f'    {synthesis_id}["📊 Merged Report"]:::report')
+                for branch_end in branch_ends or [last_node]:
+                    mermaid.append(f"    {branch_end} --> {synthesis_id}")
+                last_node = synthesis_id
+                continue
 
-        for idx, step in enumerate(self.research_path, 1):
             # Create unique IDs for each node
-            query_id = f"query_{idx}"
-            thinking_id = f"thinking_{idx}"
-            search_id = f"search_{idx}"
+            query_id = f"{prefix}query_{idx}"
+            thinking_id = f"{prefix}thinking_{idx}"
+            search_id = f"{prefix}search_{idx}"
 
             # Add query node
-            query_text = self._truncate_text(step["query"])
+            query_text = mermaid_label(self._truncate_text(step["query"]))
             mermaid.append(f'    {query_id}["❓ Query:\\n{query_text}"]:::query')
             mermaid.append(f"    {last_node} --> {query_id}")
+            last_node = query_id
 
-            # Extract and add thinking process if present
-            if "<think>" in step["assistant_response"]:
-                thinking_text = self._extract_thinking(step["assistant_response"])
+            # Extract and add thinking process if present (inline in the
+            # response, or captured to a ThinkStore under "think")
+            if "<think>" in step["assistant_response"] or step.get("think"):
+                thinking_text = mermaid_label(
+                    self._extract_thinking(
+                        step["assistant_response"], step.get("think")
+                    )
+                )
                 if thinking_text:
                     mermaid.append(
                         f'    {thinking_id}["🤔 Thinking:\\n{thinking_text}"]:::thinking'
@@ -45,8 +121,8 @@ class ResearchPathVisualizer:
                     last_node = thinking_id
 
             # Add search results if present
-            if step["search_results"]:
-                search_summary = self._summarize_search_results(step["search_results"])
+            if step.get("results"):
+                search_summary = self._summarize_search_results(step)
                 mermaid.append(
                     f'    {search_id}["🔍 Search Results:\\n{search_summary}"]:::search'
                 )
@@ -55,15 +131,19 @@ class ResearchPathVisualizer:
 
             # Check if this is the final report
             if "<report>" in step["assistant_response"]:
-                report_id = f"report_{idx}"
+                report_id = f"{prefix}report_{idx}"
                 mermaid.append(f'    {report_id}["📊 Final Report"]:::report')
                 mermaid.append(f"    {last_node} --> {report_id}")
+                last_node = report_id
 
-        mermaid.append("```")
-        return "\n".join(mermaid)
+        return last_node
 
     def to_json(self, output_file: str = None) -> str:
         """Export the research path as JSON for external visualization tools."""
+        with span("export.json", steps=len(self.research_path)):
+            return self._to_json(output_file)
+
+    def _to_json(self, output_file: str = None) -> str:
         export_data = {
             "metadata": {
                 "timestamp": datetime.now().isoformat(),
@@ -72,7 +152,8 @@ class ResearchPathVisualizer:
             "path": self.research_path,
         }
 
-        json_str = json.dumps(export_data, indent=2)
+        # default=str resolves blob references to their text
+        json_str = json.dumps(export_data, indent=2, default=str)
         if output_file:
             with open(output_file, "w") as f:
                 f.write(json_str)
@@ -84,18 +165,195 @@ class ResearchPathVisualizer:
         return f"{text[:max_length]}..." if len(text) > max_length else text
 
     @staticmethod
-    def _extract_thinking(response: str) -> str:
-        """Extract thinking process from between <think> tags."""
+    def _extract_thinking(response: str, captured=None) -> str:
+        """
+        Extract thinking process from between <think> tags, falling back to
+        chain-of-thought captured outside the response (e.g. a ThinkRef).
+        """
         import re
 
         think_matches = re.findall(r"<think>(.*?)</think>", response, re.DOTALL)
         if think_matches:
             return ResearchPathVisualizer._truncate_text(think_matches[0].strip())
+        if captured:
+            return ResearchPathVisualizer._truncate_text(str(captured).strip())
         return ""
 
     @staticmethod
-    def _summarize_search_results(results: str) -> str:
+    def _summarize_search_results(step: Dict) -> str:
         """Create a brief summary of search results."""
-        # Count the number of search results
-        result_count = results.count("```search")
+        result_count = step.get("result_count")
+        if result_count is None:
+            # Paths recorded before result counts were kept (e.g. loaded JSON)
+            result_count = str(step["results"]).count("```search")
         return f"{result_count} results found"
+
+
+class LiveGraphExporter:
+    """
+    Writes the research path as Mermaid and/or Graphviz DOT files while the run
+    is in progress, so the graph can be watched (and re-rendered) step by step.
+
+    Every step appends a few node and edge lines; the DOT file's closing brace is
+    overwritten and re-appended, so both files are valid after each step and the
+    cost of a step does not depend on the length of the path. Once a chain has
+    collapse_after steps, further steps are folded into one summary node whose
+    label is re-declared with the running count and the latest query.
+
+    Tree runs are drawn with one chain per sub-topic: a "plan" step fans out to
+    the chains named by branch_chain(), which the child agents write to, and a
+    "synthesis" step joins their last nodes.
+
+    Args:
+        mermaid_path: Mermaid file to write, or None
+        dot_path: DOT file to write, or None
+        collapse_after: Steps drawn individually per chain before collapsing
+    """
+
+    NODE_COLORS = {
+        "query": "#e1f5fe",
+        "thinking": "#f3e5f5",
+        "search": "#f1f8e9",
+        "report": "#fff3e0",
+        "error": "#ffebee",
+    }
+    DOT_TRAILER = b"}\n"
+
+    def __init__(
+        self, mermaid_path: str = None, dot_path: str = None, collapse_after: int = 12
+    ):
+        self.mermaid_path = Path(mermaid_path) if mermaid_path else None
+        self.dot_path = Path(dot_path) if dot_path else None
+        self.collapse_after = collapse_after
+        self._lock = threading.Lock()
+        self._chains: Dict[str, Dict] = {}
+        self._branches: Dict[str, List[str]] = {}
+
+        if self.mermaid_path:
+            self.mermaid_path.parent.mkdir(parents=True, exist_ok=True)
+            lines = ["flowchart TD"] + [
+                f"    classDef {kind} fill:{color}"
+                for kind, color in self.NODE_COLORS.items()
+            ]
+            self.mermaid_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        if self.dot_path:
+            self.dot_path.parent.mkdir(parents=True, exist_ok=True)
+            header = (
+                "digraph research {\n"
+                "  rankdir=TB;\n"
+                '  node [shape=box, style="rounded,filled"];\n'
+            )
+            self.dot_path.write_bytes(header.encode("utf-8") + self.DOT_TRAILER)
+        self._node("start", "🔍 Initial Question", "query")
+
+    @staticmethod
+    def branch_chain(chain: str, number: int) -> str:
+        """Name of the chain of sub-topic number (1-based) of a plan in chain."""
+        return f"{chain}b{number}_"
+
+    def _chain(self, chain: str) -> Dict:
+        if chain not in self._chains:
+            self._chains[chain] = {"last": "start", "steps": 0, "collapsed": 0}
+        return self._chains[chain]
+
+    def _append(self, mermaid: List[str], dot: List[str]):
+        if self.mermaid_path:
+            with open(self.mermaid_path, "a", encoding="utf-8") as f:
+                f.write("".join(f"    {line}\n" for line in mermaid))
+        if self.dot_path:
+            data = "".join(f"  {line}\n" for line in dot).encode("utf-8")
+            with open(self.dot_path, "r+b") as f:
+                # Overwrite the closing brace and append it again
+                f.seek(-len(self.DOT_TRAILER), 2)
+                f.write(data + self.DOT_TRAILER)
+
+    def _node(self, node_id: str, label: str, kind: str):
+        """Declare a node, or update the label of a declared one."""
+        node_label = mermaid_label(label)
+        dot_label = label.replace("\\", "\\\\").replace('"', '\\"')
+        dot_label = dot_label.replace("\n", "\\n")
+        color = self.NODE_COLORS[kind]
+        self._append(
+            [f'{node_id}["{node_label}"]:::{kind}'],
+            [f'{node_id} [label="{dot_label}", fillcolor="{color}"];'],
+        )
+
+    def _edge(self, source: str, target: str):
+        self._append([f"{source} --> {target}"], [f"{source} -> {target};"])
+
+    def add_step(self, step: Dict, chain: str = ""):
+        """Draw one research_path entry at the end of chain ("" is the main one)."""
+        with self._lock, span("export.live_graph"):
+            step_type = step.get("type")
+            state = self._chain(chain)
+            if step_type == "plan":
+                self._add_plan(step, chain, state)
+            elif step_type == "synthesis":
+                self._add_synthesis(chain, state)
+            elif step_type != "branch":
+                # Branch steps were drawn by their child agents already
+                self._add_research_step(step, chain, state)
+
+    def _add_plan(self, step: Dict, chain: str, state: Dict):
+        plan_id = f"{chain}plan"
+        subtopics = step.get("subtopics", [])
+        self._node(plan_id, f"🗂️ Plan:\n{len(subtopics)} sub-topics", "thinking")
+        self._edge(state["last"], plan_id)
+        state["last"] = plan_id
+        branches = self._branches[chain] = []
+        for number, subtopic in enumerate(subtopics, 1):
+            branch = self.branch_chain(chain, number)
+            topic_id = f"{branch}topic"
+            topic = ResearchPathVisualizer._truncate_text(subtopic)
+            self._node(topic_id, f"🧭 Sub-topic {number}:\n{topic}", "query")
+            self._edge(plan_id, topic_id)
+            self._chains[branch] = {"last": topic_id, "steps": 0, "collapsed": 0}
+            branches.append(branch)
+
+    def _add_synthesis(self, chain: str, state: Dict):
+        synthesis_id = f"{chain}synthesis"
+        self._node(synthesis_id, "📊 Merged Report", "report")
+        branches = self._branches.get(chain) or [chain]
+        for branch in branches:
+            self._edge(self._chain(branch)["last"], synthesis_id)
+        state["last"] = synthesis_id
+
+    def _add_research_step(self, step: Dict, chain: str, state: Dict):
+        state["steps"] += 1
+        number = state["steps"]
+        query = ResearchPathVisualizer._truncate_text(step.get("query", ""))
+        reported = "<report>" in step.get("assistant_response", "")
+        stop_reason = step.get("stop_reason")
+
+        if number <= self.collapse_after or reported or stop_reason:
+            node_id = f"{chain}step_{number}"
+            label = f"❓ Query {number}:\n{query}"
+            if step.get("result_count") is not None:
+                label = f"{label}\n🔍 {step['result_count']} results"
+            self._node(node_id, label, "query")
+            self._edge(state["last"], node_id)
+            state["last"] = node_id
+        else:
+            # Fold the step into the chain's summary node
+            summary_id = f"{chain}collapsed"
+            state["collapsed"] += 1
+            steps = "step" if state["collapsed"] == 1 else "steps"
+            self._node(
+                summary_id,
+                f"⋯ {state['collapsed']} more {steps}\nlatest: {query}",
+                "search",
+            )
+            if state["last"] != summary_id:
+                self._edge(state["last"], summary_id)
+                state["last"] = summary_id
+
+        if reported:
+            report_id = f"{chain}report"
+            self._node(report_id, "📊 Final Report", "report")
+            self._edge(state["last"], report_id)
+            state["last"] = report_id
+        elif stop_reason:
+            stop_id = f"{chain}stopped"
+            self._node(stop_id, f"⏹️ Stopped:\n{stop_reason}", "error")
+            self._edge(state["last"], stop_id)
+            state["last"] = stop_id
@@ -0,0 +1,7 @@
+# conftest.py
+
+import sys
+from pathlib import Path
+
+# Make the agent package importable when pytest is run as `pytest tests`
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,93 @@
+import threading
+
+from agent.budget import (
+    STOP_DEADLINE,
+    STOP_MAX_OUTPUT_TOKENS,
+    STOP_MAX_STEPS,
+    STOP_MAX_TOOL_CALLS,
+    ResearchBudget,
+)
+
+
+def test_unlimited_budget_never_stops():
+    tracker = ResearchBudget().tracker()
+    for _ in range(100):
+        assert tracker.begin_step() == (None, None)
+        tracker.record_step(1000)
+        assert tracker.claim_tool_call()
+    assert tracker.usage()["steps"] == 100
+
+
+def test_last_step_is_announced_before_the_limit():
+    tracker = ResearchBudget(max_steps=3).tracker()
+    assert tracker.begin_step() == (None, None)
+    tracker.record_step(10)
+    assert tracker.begin_step() == (None, None)
+    tracker.record_step(10)
+    assert tracker.begin_step() == (None, STOP_MAX_STEPS)
+    tracker.record_step(10)
+    assert tracker.begin_step() == (STOP_MAX_STEPS, None)
+    assert tracker.steps == 3
+
+
+def test_pending_and_reserved_steps_count_as_used():
+    tracker = ResearchBudget(max_steps=3).tracker()
+    tracker.reserved_steps = 1
+    tracker.begin_step()
+    assert tracker.begin_step()[0] is None
+    assert tracker.begin_step() == (STOP_MAX_STEPS, None)
+
+
+def test_tool_calls_are_claimed_up_to_the_limit():
+    tracker = ResearchBudget(max_tool_calls=2).tracker()
+    assert tracker.claim_tool_call()
+    assert tracker.claim_tool_call()
+    assert not tracker.claim_tool_call()
+    assert tracker.tool_calls == 2
+    assert tracker.begin_step() == (None, STOP_MAX_TOOL_CALLS)
+
+
+def test_output_tokens_keep_a_margin_for_the_report():
+    tracker = ResearchBudget(max_output_tokens=1000, margin=0.2).tracker()
+    tracker.begin_step()
+    tracker.record_step(300)
+    assert tracker.begin_step() == (None, None)
+    tracker.record_step(300)
+    # Another average step would reach the 800 tokens before the margin
+    assert tracker.begin_step() == (None, STOP_MAX_OUTPUT_TOKENS)
+    tracker.record_step(400)
+    assert tracker.begin_step() == (STOP_MAX_OUTPUT_TOKENS, None)
+
+
+def test_deadline_stops_the_run():
+    tracker = ResearchBudget(deadline_seconds=0.0).tracker()
+    assert tracker.begin_step() == (STOP_DEADLINE, None)
+    assert tracker.pending_steps == 0
+
+
+def test_shared_tracker_stays_within_limits_across_threads():
+    tracker = ResearchBudget(max_steps=10, max_tool_calls=7).tracker()
+    begun = []
+    tool_calls = []
+    start = threading.Barrier(8)
+
+    def branch():
+        start.wait()
+        while True:
+            exhausted, _ = tracker.begin_step()
+            if exhausted:
+                return
+            begun.append(1)
+            if tracker.claim_tool_call():
+                tool_calls.append(1)
+            tracker.record_step(5)
+
+    threads = [threading.Thread(target=branch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(begun) == tracker.steps == 10
+    assert len(tool_calls) == tracker.tool_calls == 7
+    assert tracker.pending_steps == 0
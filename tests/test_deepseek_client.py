@@ -0,0 +1,123 @@
+import json
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from azure.ai.inference.models import UserMessage
+
+from agent.deepseek_client import DeepseekClient
+
+TOKENS = ["<think>", "a ", "b ", "</think>", "<query>", "solana", "</query>"]
+
+
+class _StallingHandler(BaseHTTPRequestHandler):
+    """Streams 4 tokens on the first request and then holds the connection open."""
+
+    protocol_version = "HTTP/1.1"
+    requests = 0
+    release = threading.Event()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _event(self, content: str) -> bytes:
+        data = {
+            "id": "stall",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "m",
+            "choices": [{"index": 0, "delta": {"content": content}}],
+        }
+        return f"data: {json.dumps(data)}\n\n".encode()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        if type(self).requests == 1:
+            for token in TOKENS[:4]:
+                self._send(self._event(token))
+            # Stall with the connection open
+            type(self).release.wait(10)
+            return
+
+        # The resumed request continues after the assistant prefix
+        prefix = request["messages"][-1]["content"]
+        remaining = "".join(TOKENS)[len(prefix) :]
+        self._send(self._event(remaining))
+        self._send(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def test_stall_with_open_connection_resumes_after_stall_timeout():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StallingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    os.environ["AZURE_DEEPSEEK_ENDPOINT"] = f"http://{host}:{port}"
+    os.environ["AZURE_DEEPSEEK_API_KEY"] = "test-key"
+    try:
+        client = DeepseekClient(stall_timeout=0.5, request_timeout=30)
+        started = time.monotonic()
+        response = client.complete([UserMessage(content="q")])
+        elapsed = time.monotonic() - started
+    finally:
+        _StallingHandler.release.set()
+        server.shutdown()
+
+    assert elapsed < 3
+    assert client.last_resumes == 1
+    assert response.endswith("<query>solana</query>")
+
+
+class _DroppingHandler(_StallingHandler):
+    """Drops the connection of the first request before sending a response."""
+
+    requests = 0
+
+    def do_POST(self):
+        if type(self).requests == 0:
+            type(self).requests += 1
+            self.rfile.read(int(self.headers["Content-Length"]))
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        type(self).requests += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        assert request["messages"][-1]["role"] == "user"
+        self._send(self._event("".join(TOKENS)))
+        self._send(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def test_request_that_fails_to_open_is_resumed():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _DroppingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    os.environ["AZURE_DEEPSEEK_ENDPOINT"] = f"http://{host}:{port}"
+    os.environ["AZURE_DEEPSEEK_API_KEY"] = "test-key"
+    try:
+        client = DeepseekClient(stall_timeout=5, request_timeout=30)
+        response = client.complete([UserMessage(content="q")])
+    finally:
+        server.shutdown()
+
+    assert client.last_resumes == 1
+    assert response.endswith("<query>solana</query>")
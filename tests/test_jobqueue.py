@@ -0,0 +1,122 @@
+import json
+
+import pytest
+
+from agent.jobqueue import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_LEASED,
+    STATUS_QUEUED,
+    SQLiteJobQueue,
+    run_worker,
+)
+
+
+def job_status(queue: SQLiteJobQueue, job_id: str) -> dict:
+    return next(job for job in queue.jobs() if job["id"] == job_id)
+
+
+def test_enqueueing_the_same_job_twice_is_a_no_op(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3")
+    first = queue.enqueue("Is Solana fast?", {"tool": "synthetic"})
+    again = queue.enqueue("Is Solana fast?", {"tool": "synthetic"})
+    other = queue.enqueue("Is Solana fast?", {"tool": "search"})
+    assert first == again != other
+    assert queue.stats()[STATUS_QUEUED] == 2
+
+
+def test_unknown_options_are_rejected(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3")
+    with pytest.raises(ValueError, match="corpus_dir"):
+        queue.enqueue("Is Solana fast?", {"corpus_dir": "/etc"})
+
+
+def test_a_leased_job_is_not_handed_out_twice(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3")
+    job_id = queue.enqueue("Is Solana fast?")
+    job = queue.lease("worker-1")
+    assert job == {
+        "id": job_id,
+        "question": "Is Solana fast?",
+        "options": {},
+        "attempts": 1,
+    }
+    assert queue.lease("worker-2") is None
+    assert queue.heartbeat(job_id, "worker-1")
+    assert not queue.heartbeat(job_id, "worker-2")
+    assert queue.complete(job_id, "worker-1", "report", "out")
+    assert job_status(queue, job_id)["status"] == STATUS_DONE
+
+
+def test_expired_lease_is_retried_by_another_worker(tmp_path):
+    # A negative lease expires as soon as it is taken
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3", lease_seconds=-1)
+    job_id = queue.enqueue("Is Solana fast?")
+    queue.lease("worker-1")
+    job = queue.lease("worker-2")
+    assert job["attempts"] == 2
+    assert job_status(queue, job_id)["lease_owner"] == "worker-2"
+
+    # The first worker lost the job and cannot complete it anymore
+    assert not queue.heartbeat(job_id, "worker-1")
+    assert not queue.complete(job_id, "worker-1", "report", "out")
+    assert job_status(queue, job_id)["status"] == STATUS_LEASED
+
+
+def test_expired_lease_on_the_last_attempt_fails_the_job(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3", lease_seconds=-1, max_attempts=2)
+    job_id = queue.enqueue("Is Solana fast?")
+    queue.lease("worker-1")
+    queue.lease("worker-2")
+    assert queue.lease("worker-3") is None
+    status = job_status(queue, job_id)
+    assert status["status"] == STATUS_FAILED
+    assert status["error"] == "Lease expired on the last attempt"
+
+
+def test_failed_job_is_queued_again_while_attempts_are_left(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3", max_attempts=2)
+    job_id = queue.enqueue("Is Solana fast?")
+    queue.lease("worker-1")
+    assert queue.fail(job_id, "worker-1", "RuntimeError: boom")
+    assert job_status(queue, job_id)["status"] == STATUS_QUEUED
+
+    assert queue.lease("worker-2")["attempts"] == 2
+    assert queue.fail(job_id, "worker-2", "RuntimeError: boom")
+    assert job_status(queue, job_id)["status"] == STATUS_FAILED
+
+
+class _FakeAgent:
+    stop_reason = "report"
+
+    def __init__(self, options):
+        self.options = options
+        self.research_path = []
+
+    def start(self, question: str) -> str:
+        if self.options.get("tool") == "neo4j":
+            raise RuntimeError("no graph")
+        return f"Report on {question}"
+
+
+def test_worker_writes_results_and_records_failures(tmp_path):
+    queue = SQLiteJobQueue(tmp_path / "jobs.sqlite3", max_attempts=1)
+    done_id = queue.enqueue("Is Solana fast?")
+    failed_id = queue.enqueue("Who promoted BONK?", {"tool": "neo4j"})
+
+    completed = run_worker(
+        queue,
+        tmp_path / "out",
+        worker_id="worker-1",
+        agent_factory=lambda options, scheduler: _FakeAgent(options),
+        exit_when_empty=True,
+    )
+
+    assert completed == 1
+    job_dir = tmp_path / "out" / done_id
+    assert (job_dir / "report.md").read_text() == "Report on Is Solana fast?"
+    assert json.loads((job_dir / "trace.json").read_text())["traceEvents"] == []
+    assert job_status(queue, done_id)["output_dir"] == str(job_dir)
+    failed = job_status(queue, failed_id)
+    assert failed["status"] == STATUS_FAILED
+    assert failed["error"] == "RuntimeError: no graph"
@@ -0,0 +1,74 @@
+from agent.loops import (
+    ACTION_CORRECT,
+    ACTION_FORCE_REPORT,
+    LOOP_QUERY_CYCLE,
+    LOOP_REPEATED_QUERY,
+    LOOP_STALL,
+    LoopDetector,
+    jaccard,
+)
+from agent.results import RESULT_GRAPH, GraphRow, ResultSet
+
+
+def graph_result(*ends: str) -> ResultSet:
+    rows = [GraphRow("KOL", "PROMOTED", end) for end in ends]
+    return ResultSet("MATCH (n) RETURN n", rows, kind=RESULT_GRAPH)
+
+
+def test_jaccard_of_empty_term_sets_is_zero():
+    assert jaccard(frozenset(), frozenset()) == 0.0
+    assert jaccard(frozenset({"solana"}), frozenset()) == 0.0
+    assert jaccard(frozenset({"a", "b"}), frozenset({"b", "c"})) == 1 / 3
+
+
+def test_different_queries_are_not_loops():
+    detector = LoopDetector()
+    assert detector.observe_query("solana transaction fees", 1) is None
+    assert detector.observe_query("solana validator count", 2) is None
+    assert detector.events == []
+
+
+def test_repeated_query_is_corrected_then_forces_the_report():
+    detector = LoopDetector()
+    detector.observe_query("solana transaction fees", 1)
+    event = detector.observe_query("Solana transaction fees?", 2)
+    assert event["kind"] == LOOP_REPEATED_QUERY
+    assert event["action"] == ACTION_CORRECT
+    assert "step 1" in event["detail"]
+
+    event = detector.observe_query("transaction fees of solana", 3)
+    assert event["action"] == ACTION_FORCE_REPORT
+
+
+def test_query_returning_to_an_earlier_one_is_a_cycle():
+    detector = LoopDetector()
+    detector.observe_query("solana transaction fees", 1)
+    detector.observe_query("solana validator count", 2)
+    event = detector.observe_query("solana transaction fees", 3)
+    assert event["kind"] == LOOP_QUERY_CYCLE
+    assert "last 2 queries" in event["detail"]
+
+
+def test_queries_without_terms_never_match():
+    detector = LoopDetector()
+    assert detector.observe_query("", 1) is None
+    assert detector.observe_query("", 2) is None
+    assert detector.observe_query("the of and", 3) is None
+
+
+def test_identical_graph_results_stall():
+    detector = LoopDetector(stall_steps=2)
+    assert detector.observe_results(graph_result("BONK", "WIF"), 1) is None
+    assert detector.observe_results(graph_result("BONK", "WIF"), 2) is None
+    event = detector.observe_results(graph_result("WIF", "BONK"), 3)
+    assert event["kind"] == LOOP_STALL
+    assert event["step"] == 3
+
+
+def test_new_rows_reset_the_stall():
+    detector = LoopDetector(stall_steps=2)
+    detector.observe_results(graph_result("BONK"), 1)
+    assert detector.observe_results(graph_result("BONK"), 2) is None
+    assert detector.observe_results(graph_result("BONK", "POPCAT"), 3) is None
+    assert detector.observe_results(graph_result("BONK"), 4) is None
+    assert detector.observe_results(graph_result("POPCAT"), 5)["kind"] == LOOP_STALL
@@ -0,0 +1,90 @@
+from agent.passages import (
+    PassageFingerprints,
+    dedup_passages,
+    pack_passages,
+    split_passages,
+)
+from agent.utils import format_search_results
+
+
+def filler(tag: str) -> str:
+    return " ".join(f"{tag}{i}" for i in range(60))
+
+
+RESULTS = format_search_results(
+    [
+        f"Source: Weather Daily\nRain is expected tomorrow. {filler('rain')}",
+        f"Source: Chain News\nSolana validators upgraded the network. {filler('chain')}",
+        f"Source: Market Wire\nSolana fees stayed low all year. {filler('market')}",
+    ]
+)
+
+
+def test_split_passages_keeps_source_headers_out_of_the_text():
+    passages = split_passages(RESULTS)
+    assert [p["block"] for p in passages] == ["search 1", "search 2", "search 3"]
+    assert passages[1]["header"] == "Source: Chain News"
+    assert passages[1]["text"].startswith("Solana validators")
+
+
+def test_results_within_the_budget_are_unchanged():
+    assert pack_passages(RESULTS, "solana", token_budget=10_000) is RESULTS
+
+
+def test_most_relevant_passages_are_kept_in_their_blocks():
+    packed = pack_passages(RESULTS, "solana validators", token_budget=200)
+    assert "```search 2\nSource: Chain News\nSolana validators" in packed
+    assert "Rain is expected" not in packed
+    assert packed.endswith("passages kept)")
+
+
+def test_question_terms_rank_passages_too():
+    packed = pack_passages(RESULTS, "fees", question="solana", token_budget=200)
+    assert "Solana fees" in packed
+    assert "Rain is expected" not in packed
+
+
+def test_passage_over_the_budget_is_truncated():
+    packed = pack_passages(RESULTS, "solana validators", token_budget=10)
+    assert "Solana validators" in packed
+    assert "...\n```" in packed
+    assert packed.endswith("(1 of 3 passages kept)")
+
+
+def test_repeated_passages_become_back_references():
+    fingerprints = PassageFingerprints()
+    first, replaced = dedup_passages(RESULTS, 1, fingerprints)
+    assert (first, replaced) == (RESULTS, 0)
+
+    repeated = format_search_results(
+        [
+            f"Source: Other Site\nSolana validators upgraded the network. {filler('chain')}",
+            "Source: New Site\nSolana launched a new wallet for payments today.",
+        ]
+    )
+    second, replaced = dedup_passages(repeated, 2, fingerprints)
+    assert replaced == 1
+    assert "```search 1\nSource: Other Site\n(same as step 1 result 2)\n```" in second
+    assert "Solana launched a new wallet" in second
+
+
+def test_near_duplicates_are_replaced_and_unrelated_text_is_kept():
+    fingerprints = PassageFingerprints()
+    dedup_passages(RESULTS, 1, fingerprints)
+    near = f"Solana validators upgraded the whole network. {filler('chain')}"
+    _, replaced = dedup_passages(format_search_results([near]), 2, fingerprints)
+    assert replaced == 1
+
+    other = f"Solana validators upgraded the network. {filler('other')}"
+    _, replaced = dedup_passages(format_search_results([other]), 3, fingerprints)
+    assert replaced == 0
+
+
+def test_graph_rows_are_deduplicated_one_by_one():
+    fingerprints = PassageFingerprints()
+    rows = '```result\n{"name": "Solana"}\n\n{"name": "Ethereum"}\n```'
+    dedup_passages(rows, 1, fingerprints)
+    again = '```result\n{"name": "Bitcoin"}\n\n{"name": "Ethereum"}\n```'
+    text, replaced = dedup_passages(again, 2, fingerprints)
+    assert replaced == 1
+    assert "(same as step 1 row 2)" in text